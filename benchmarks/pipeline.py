@@ -0,0 +1,150 @@
+"""Time every stage of the analysis pipeline on synthetic panels of growing size.
+
+For each size a synthetic panel with a known effect is written to CSV, then
+the stages the app runs are timed with :class:`did_engine.Profiler`: CSV
+parsing (in memory and chunked), cell statistics, the regression, and
+building and serialising the time-series figure. Each size also checks that
+the estimated Diff-in-Diff recovers the true effect, and optionally that it
+matches statsmodels, so a faster path can be checked for speed and
+correctness together.
+
+Run from the repository root::
+
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline --sizes 1e3 1e5 1e7 1e8 --output timings.json
+
+Sizes above ``--max-in-memory`` rows are only read in chunks. The 1e8 row
+CSV takes about 4 GB on disk.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from did_engine.cells import CellStats
+from did_engine.charts import build_timeseries_figure
+from did_engine.ingest import stream_csv
+from did_engine.profiling import Profiler
+from did_engine.regression import fit_cells
+from did_engine.synthetic import write_synthetic_csv
+
+DEFAULT_SIZES = [1e3, 1e4, 1e5, 1e6]
+# A recovered effect is within this many standard errors of the true one
+RECOVERY_Z = 4.0
+COLUMNS = ["event_date", "metric", "treat", "post"]
+
+
+def compare_with_statsmodels(frame, regression):
+    """Largest absolute difference between our coefficients and statsmodels'."""
+    import statsmodels.formula.api as smf
+
+    fit = smf.ols("metric ~ treat * post", data=frame).fit()
+    return float(np.max(np.abs(fit.params.to_numpy() - regression.params)))
+
+
+def benchmark_size(rows, workdir, periods, effect, noise, autocorrelation, treated_share, max_in_memory, statsmodels, seed):
+    units = max(int(rows) // periods, 2)
+    path = os.path.join(workdir, "panel-" + str(units * periods) + ".csv")
+    start = time.perf_counter()
+    nrows = write_synthetic_csv(path, units, periods, seed=seed, effect=effect, noise=noise,
+                                autocorrelation=autocorrelation, treated_share=treated_share)
+    generate_seconds = time.perf_counter() - start
+
+    profiler = Profiler("benchmark", context={"rows": nrows})
+    frame = None
+    if nrows <= max_in_memory:
+        with profiler.stage("parse (read_csv)", rows=nrows):
+            frame = pd.read_csv(path, usecols=COLUMNS)
+        with profiler.stage("cell statistics", rows=nrows):
+            cells = CellStats.from_frame(frame, "metric", "treat", "post")
+    with profiler.stage("parse + cells (stream_csv)", rows=nrows):
+        streamed = stream_csv(path, *COLUMNS)
+    cells = streamed.cells if frame is None else cells
+    with profiler.stage("regression", rows=nrows):
+        regression = fit_cells(cells, "treat", "post")
+    # The app charts the raw frame when it fits in memory and the per-date means otherwise
+    chart_data = streamed.series if frame is None else frame
+    with profiler.stage("figure build", rows=len(chart_data)):
+        figure = build_timeseries_figure(chart_data, "event_date", "metric", "treat")
+    with profiler.stage("figure serialization", rows=len(chart_data)):
+        figure_json = figure.to_json()
+
+    estimate, std_err = regression.params[3], regression.bse[3]
+    result = {
+        "rows": nrows,
+        "csv_bytes": os.path.getsize(path),
+        "generate_seconds": generate_seconds,
+        "true_effect": effect,
+        "estimate": float(estimate),
+        "std_err": float(std_err),
+        "recovered": bool(abs(estimate - effect) <= RECOVERY_Z * std_err),
+        "figure_json_bytes": len(figure_json),
+        "stages": json.loads(profiler.to_json())["stages"],
+    }
+    if statsmodels and frame is not None:
+        result["statsmodels_max_abs_diff"] = compare_with_statsmodels(frame, regression)
+    os.remove(path)
+    return result
+
+
+def stage_table(results):
+    rows = []
+    for result in results:
+        for stage in result["stages"]:
+            rows.append({
+                "rows": result["rows"],
+                "stage": stage["stage"],
+                "seconds": round(stage["seconds"], 4),
+                "rows_per_second": round(result["rows"] / stage["seconds"]) if stage["seconds"] else None,
+                "peak_rss_increase_mb": (None if stage["peak_rss_increase_bytes"] is None
+                                         else round(stage["peak_rss_increase_bytes"] / 2 ** 20, 1)),
+            })
+    return pd.DataFrame(rows)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.pipeline", description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=DEFAULT_SIZES, help="panel sizes in rows (default: 1e3 1e4 1e5 1e6)")
+    parser.add_argument("--periods", type=int, default=52, help="periods per unit (default: %(default)s)")
+    parser.add_argument("--effect", type=float, default=1.0, help="true Diff-in-Diff effect (default: %(default)s)")
+    parser.add_argument("--noise", type=float, default=1.0, help="noise standard deviation (default: %(default)s)")
+    parser.add_argument("--autocorrelation", type=float, default=0.0, help="AR(1) correlation of the noise (default: %(default)s)")
+    parser.add_argument("--treated-share", type=float, default=0.5, help="share of treated units (default: %(default)s)")
+    parser.add_argument("--max-in-memory", type=float, default=2e7, help="largest size also parsed in memory (default: %(default)g)")
+    parser.add_argument("--statsmodels", action="store_true", help="compare the coefficients with statsmodels (in-memory sizes)")
+    parser.add_argument("--workdir", default=None, help="where to write the CSV files (default: a temporary directory)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", "-o", default=None, help="write the full results as JSON")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        results = []
+        for size in args.sizes:
+            result = benchmark_size(size, workdir, args.periods, args.effect, args.noise, args.autocorrelation,
+                                    args.treated_share, args.max_in_memory, args.statsmodels, args.seed)
+            results.append(result)
+            summary = (str(result["rows"]) + " rows: estimate " + format(result["estimate"], ".4f") + " +/- "
+                       + format(result["std_err"], ".4f") + " (true " + str(args.effect) + ") "
+                       + ("recovered" if result["recovered"] else "NOT RECOVERED"))
+            if "statsmodels_max_abs_diff" in result:
+                summary += ", max difference with statsmodels " + format(result["statsmodels_max_abs_diff"], ".2e")
+            print(summary, flush=True)
+
+    with pd.option_context("display.width", 200, "display.max_rows", None):
+        print(stage_table(results).to_string(index=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    return 0 if all(result["recovered"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
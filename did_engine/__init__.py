@@ -0,0 +1,61 @@
+"""Statistics engine behind the Difference-in-Differences Analysis Tool.
+
+Nothing imported here pulls in Streamlit or plotly (only ``did_engine.charts``
+needs plotly), so the statistics can be used from scripts, notebooks and
+``python -m did_engine`` as well as from ``streamlit_app.py``.
+"""
+
+from did_engine.batch import adjust_pvalues, batch_diff_in_diff
+from did_engine.cache import ResultCache, content_hash
+from did_engine.cells import CellStats, summary_table
+from did_engine.event_study import EventStudyResult, event_study
+from did_engine.executor import Job, JobCancelled, JobManager
+from did_engine.inference import BootstrapResult, ClusterStats, PermutationResult, bootstrap, permutation_test
+from did_engine.ingest import BufferFile, StreamedData, file_format, read_columns, read_preview, read_sample, stream_csv
+from did_engine.profiling import Profiler, StageRecord
+from did_engine.regression import DiDRegression, fit_cells
+from did_engine.runner import JobSpec, run_job, run_jobs
+from did_engine.sensitivity import cutover_sweep, first_flagged_date, stream_cutover_sweep
+from did_engine.store import AppendReport, IncrementalAnalysis, list_analyses
+from did_engine.synthetic import synthetic_panel, write_synthetic_csv
+
+__all__ = [
+    "AppendReport",
+    "BootstrapResult",
+    "BufferFile",
+    "CellStats",
+    "ClusterStats",
+    "DiDRegression",
+    "EventStudyResult",
+    "IncrementalAnalysis",
+    "Job",
+    "JobCancelled",
+    "JobManager",
+    "JobSpec",
+    "PermutationResult",
+    "Profiler",
+    "ResultCache",
+    "StageRecord",
+    "StreamedData",
+    "adjust_pvalues",
+    "batch_diff_in_diff",
+    "bootstrap",
+    "content_hash",
+    "cutover_sweep",
+    "event_study",
+    "file_format",
+    "first_flagged_date",
+    "fit_cells",
+    "list_analyses",
+    "permutation_test",
+    "read_columns",
+    "read_preview",
+    "read_sample",
+    "run_job",
+    "run_jobs",
+    "stream_csv",
+    "stream_cutover_sweep",
+    "summary_table",
+    "synthetic_panel",
+    "write_synthetic_csv",
+]
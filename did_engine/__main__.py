@@ -0,0 +1,5 @@
+import sys
+
+from did_engine.cli import main
+
+sys.exit(main())
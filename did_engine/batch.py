@@ -0,0 +1,117 @@
+"""The same treat x post design evaluated over many metrics and segments.
+
+Rows are coded once as ``4 * segment + 2 * treat + post``; each metric then
+takes a single ``bincount`` pass to fill the 2x2 cells of every segment, and
+the closed-form regression is evaluated for all (metric, segment) pairs at
+once. With many segments and metrics the per-metric passes can be spread over
+a process pool.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from did_engine.cells import CellStats, cell_codes
+from did_engine.regression import closed_form
+
+CORRECTIONS = ("holm", "bonferroni", "fdr_bh", "none")
+ALL_SEGMENTS = "All"
+# Below this many segments the per-metric passes are too cheap to be worth a pool
+POOL_MIN_SEGMENTS = 1_000
+
+
+def adjust_pvalues(pvalues, method="holm"):
+    """Multiple-testing adjusted p-values; NaN p-values are left out and kept NaN.
+
+    ``method`` is ``"holm"`` (Holm-Bonferroni step-down), ``"bonferroni"``,
+    ``"fdr_bh"`` (Benjamini-Hochberg false discovery rate) or ``"none"``.
+    """
+    if method not in CORRECTIONS:
+        raise ValueError("method must be one of " + ", ".join(CORRECTIONS))
+    pvalues = np.asarray(pvalues, dtype=np.float64)
+    adjusted = np.full_like(pvalues, np.nan)
+    tested = np.flatnonzero(~np.isnan(pvalues))
+    m = len(tested)
+    if m == 0 or method == "none":
+        return pvalues.copy()
+    order = tested[np.argsort(pvalues[tested], kind="stable")]
+    sorted_p = pvalues[order]
+    if method == "bonferroni":
+        adjusted_sorted = sorted_p * m
+    elif method == "holm":
+        adjusted_sorted = np.maximum.accumulate(sorted_p * (m - np.arange(m)))
+    else:
+        adjusted_sorted = np.minimum.accumulate((sorted_p * m / np.arange(1, m + 1))[::-1])[::-1]
+    adjusted[order] = np.minimum(adjusted_sorted, 1.0)
+    return adjusted
+
+
+def _aggregate_metrics(codes, valid, n_segments, values):
+    """Cell statistics of each column of ``values``, stacked on the first axis."""
+    stacked = []
+    for column in values.T:
+        keep = valid & ~np.isnan(column)
+        stacked.append(CellStats.from_codes(codes[keep], column[keep], n_groups=n_segments))
+    return CellStats(*(np.stack([getattr(cells, name) for cells in stacked]) for name in ("count", "total", "total_sq", "shift")))
+
+
+def batch_cells(dataframe, metric_names, groups_name, intervention_date_name, segment_name=None, max_workers=None):
+    """Cell statistics for every (metric, segment) pair.
+
+    Returns the stacked ``CellStats`` with shape ``(metrics, segments, 2, 2)``
+    and the segment labels. Rows with a missing segment are ignored.
+    ``max_workers`` > 1 runs groups of metrics in separate processes when
+    there are at least ``POOL_MIN_SEGMENTS`` segments.
+    """
+    codes, valid = cell_codes(dataframe[groups_name].to_numpy(), dataframe[intervention_date_name].to_numpy())
+    if segment_name is None:
+        segments = pd.Index([ALL_SEGMENTS])
+    else:
+        segment_codes, segments = pd.factorize(dataframe[segment_name], sort=True)
+        valid &= segment_codes >= 0
+        codes = codes + 4 * np.maximum(segment_codes, 0)
+    values = np.column_stack([
+        pd.to_numeric(dataframe[name], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        for name in metric_names
+    ])
+
+    if max_workers and max_workers > 1 and len(segments) >= POOL_MIN_SEGMENTS and len(metric_names) > 1:
+        blocks = np.array_split(np.arange(len(metric_names)), min(max_workers, len(metric_names)))
+        with ProcessPoolExecutor(max_workers=len(blocks)) as pool:
+            parts = list(pool.map(_aggregate_metrics, *zip(*[(codes, valid, len(segments), values[:, block]) for block in blocks])))
+        cells = CellStats(*(np.concatenate([getattr(part, name) for part in parts]) for name in ("count", "total", "total_sq", "shift")))
+    else:
+        cells = _aggregate_metrics(codes, valid, len(segments), values)
+    return cells, segments
+
+
+def batch_diff_in_diff(dataframe, metric_names, groups_name, intervention_date_name, segment_name=None,
+                       correction="holm", alpha=0.05, max_workers=None):
+    """Diff-in-diff estimate, standard error, CI and p-value per (metric, segment).
+
+    The ``p_adjusted`` column applies ``correction`` (see ``adjust_pvalues``)
+    across every row of the table.
+    """
+    cells, segments = batch_cells(dataframe, metric_names, groups_name, intervention_date_name, segment_name, max_workers)
+    params, bse, df_resid = closed_form(cells)
+    estimate, std_err = params[..., 3], bse[..., 3]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tvalues = estimate / std_err
+    pvalues = 2 * stats.t.sf(np.abs(tvalues), df_resid)
+    margin = stats.t.ppf(1 - alpha / 2, df_resid) * std_err
+
+    results = pd.DataFrame({
+        "metric": np.repeat(list(metric_names), len(segments)),
+        "segment": np.tile(np.asarray(segments, dtype=object), len(metric_names)),
+        "nobs": cells.nobs.ravel().astype(np.int64),
+        "diff_in_diff": estimate.ravel(),
+        "std_err": std_err.ravel(),
+        "t": tvalues.ravel(),
+        "p_value": pvalues.ravel(),
+        "ci_low": (estimate - margin).ravel(),
+        "ci_high": (estimate + margin).ravel(),
+    })
+    results["p_adjusted"] = adjust_pvalues(results["p_value"].to_numpy(), correction)
+    return results
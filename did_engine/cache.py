@@ -0,0 +1,145 @@
+"""Content-addressed memoisation of parsed data and analysis results.
+
+Keys start with the hash of the input file's bytes, followed by whatever else
+the result depends on (the selected columns, the stage name), so the same
+file uploaded twice, or opened by two users, maps to the same entries.
+"""
+
+import dataclasses
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def content_hash(source):
+    """BLAKE2b digest of a path, a file object or a bytes-like object."""
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+    elif hasattr(source, "getbuffer"):
+        digest.update(source.getbuffer())
+    elif hasattr(source, "read"):
+        source.seek(0)
+        for block in iter(lambda: source.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+        source.seek(0)
+    else:
+        digest.update(memoryview(source))
+    return digest.hexdigest()
+
+
+def approximate_size(value):
+    """Rough in-memory size of a cached value in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(approximate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(approximate_size(item) for item in value.values())
+    if dataclasses.is_dataclass(value):
+        return sum(approximate_size(getattr(value, field.name)) for field in dataclasses.fields(value))
+    if hasattr(value, "to_plotly_json"):
+        # Plotly figures: the trace data dominates
+        return sum(approximate_size(item) for trace in value.data for item in trace.to_plotly_json().values())
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Thread-safe LRU cache bounded by entry count, total size and age.
+
+    ``get_or_compute`` runs the computation for a missing key at most once at
+    a time: concurrent callers asking for the same key wait for the first one
+    and share its result.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=2 << 30, ttl=3600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, size, stored_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl is not None and time.monotonic() - entry[2] > self.ttl:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._lookup(key)
+        return default if entry is None else entry[0]
+
+    def put(self, key, value):
+        size = approximate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry[0]
+                self.misses += 1
+            try:
+                value = compute()
+                self.put(key, value)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
@@ -0,0 +1,179 @@
+"""Per-cell sufficient statistics for the 2x2 diff-in-diff design.
+
+Every number the app shows for a 2x2 analysis (the before/after means, the
+counterfactual and the regression table) is a function of the count, sum and
+sum of squares of the metric in each of the four treat x post cells, so the
+data only needs to be scanned once.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+def cell_codes(treat, post):
+    """Map 0/1 treat and post flags to cell codes ``2 * treat + post``.
+
+    Returns the codes together with a boolean mask of the rows whose flags are
+    both 0 or 1; rows with any other value belong to no cell, exactly like the
+    ``groups == 1 & intervention == 0`` style filters this replaces.
+    """
+    treat = np.asarray(treat)
+    post = np.asarray(post)
+    valid = ((treat == 0) | (treat == 1)) & ((post == 0) | (post == 1))
+    codes = np.where(valid, 2 * (treat == 1) + (post == 1), 0).astype(np.intp)
+    return codes, valid
+
+
+@dataclass
+class CellStats:
+    """Count, sum and sum of squares of the metric in each treat x post cell.
+
+    Arrays have shape ``(..., 2, 2)`` and are indexed ``[..., treat, post]``,
+    so ``count[0, 1]`` is the number of control rows after the intervention.
+    Leading axes let several analyses be stacked and processed together.
+    Two ``CellStats`` built from disjoint rows can be merged with ``+``.
+
+    ``total`` and ``total_sq`` are taken around ``shift``, a reference value
+    per cell (the cell mean when built from data). Raw sums of squares lose
+    most of their digits when the mean is large next to the spread, e.g. a
+    level of 1e8 with a standard deviation of 1; shifted sums do not.
+    """
+
+    count: np.ndarray
+    total: np.ndarray
+    total_sq: np.ndarray
+    shift: np.ndarray = 0.0
+
+    @classmethod
+    def from_codes(cls, codes, values, n_groups=1):
+        """Aggregate ``values`` by cell code with ``bincount``.
+
+        ``codes`` may address ``n_groups`` stacked 2x2 tables: code
+        ``4 * g + 2 * treat + post`` lands in table ``g``. A first pass finds
+        the cell means, which become the shift of the second.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        minlength = 4 * n_groups
+        count = np.bincount(codes, minlength=minlength).astype(np.float64)
+        shift = np.divide(np.bincount(codes, weights=values, minlength=minlength), count,
+                          out=np.zeros(minlength), where=count > 0)
+        deviation = values - shift[codes]
+        total = np.bincount(codes, weights=deviation, minlength=minlength)
+        total_sq = np.bincount(codes, weights=deviation * deviation, minlength=minlength)
+        shape = (2, 2) if n_groups == 1 else (n_groups, 2, 2)
+        return cls(count.reshape(shape), total.reshape(shape), total_sq.reshape(shape), shift.reshape(shape))
+
+    @classmethod
+    def from_summaries(cls, codes, count, mean, sum_sq_dev, n_groups=1):
+        """Cells from per-row summaries (count, mean, sum of squared deviations) of groups of rows.
+
+        ``codes`` gives the cell of each summary, as in ``from_codes``.
+        """
+        count = np.asarray(count, dtype=np.float64)
+        mean = np.asarray(mean, dtype=np.float64)
+        minlength = 4 * n_groups
+        cell_count = np.bincount(codes, weights=count, minlength=minlength)
+        shift = np.divide(np.bincount(codes, weights=count * mean, minlength=minlength), cell_count,
+                          out=np.zeros(minlength), where=cell_count > 0)
+        deviation = mean - shift[codes]
+        total = np.bincount(codes, weights=count * deviation, minlength=minlength)
+        total_sq = np.bincount(codes, weights=np.asarray(sum_sq_dev, dtype=np.float64) + count * deviation * deviation,
+                               minlength=minlength)
+        shape = (2, 2) if n_groups == 1 else (n_groups, 2, 2)
+        return cls(cell_count.reshape(shape), total.reshape(shape), total_sq.reshape(shape), shift.reshape(shape))
+
+    @classmethod
+    def from_frame(cls, dataframe, metric_name, groups_name, intervention_date_name):
+        """Aggregate a frame given its metric, groups and intervention columns.
+
+        Rows with a missing metric are skipped, as ``mean()`` and the OLS fit
+        already do.
+        """
+        values = pd.to_numeric(dataframe[metric_name], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        codes, valid = cell_codes(dataframe[groups_name].to_numpy(), dataframe[intervention_date_name].to_numpy())
+        valid &= ~np.isnan(values)
+        return cls.from_codes(codes[valid], values[valid])
+
+    @classmethod
+    def empty(cls, shape=()):
+        zeros = np.zeros(tuple(shape) + (2, 2))
+        return cls(zeros, zeros.copy(), zeros.copy(), zeros.copy())
+
+    def shifted(self, shift):
+        """The same statistics with ``total`` and ``total_sq`` taken around ``shift``.
+
+        Statistics that share a shift can be summed, or weighted and summed,
+        element by element.
+        """
+        delta = self.shift - shift
+        return CellStats(self.count, self.total + self.count * delta,
+                         self.total_sq + 2 * delta * self.total + self.count * delta * delta,
+                         np.zeros_like(self.count) + shift)
+
+    def __add__(self, other):
+        # Pairwise merge of means and sums of squared deviations (Chan et al.)
+        count = self.count + other.count
+        mean, other_mean = np.nan_to_num(self.mean), np.nan_to_num(other.mean)
+        delta = other_mean - mean
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight = np.where(count > 0, other.count / count, 0.0)
+        sum_sq_dev = self.sum_sq_dev + other.sum_sq_dev + delta * delta * self.count * weight
+        return CellStats(count, np.zeros_like(count), sum_sq_dev, mean + delta * weight)
+
+    @property
+    def nobs(self):
+        return self.count.sum(axis=(-2, -1))
+
+    @property
+    def mean(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.shift + self.total / self.count
+
+    @property
+    def sum_sq_dev(self):
+        """Within-cell sum of squared deviations from the cell mean."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ssd = self.total_sq - np.where(self.count > 0, self.total * self.total / self.count, 0.0)
+        return np.maximum(ssd, 0.0)
+
+    @property
+    def diff_in_diff(self):
+        m = self.mean
+        return (m[..., 1, 1] - m[..., 1, 0]) - (m[..., 0, 1] - m[..., 0, 0])
+
+
+def merge_summaries(stats, delta):
+    """Combine two frames of per-key count, mean and sum of squared deviations (Chan et al.).
+
+    Keys are the index; a key missing from one frame counts as no rows.
+    """
+    stats, delta = stats.align(delta, join="outer", fill_value=0)
+    count = stats["count"] + delta["count"]
+    difference = delta["mean"] - stats["mean"]
+    weight = delta["count"] / count
+    return pd.DataFrame({
+        "count": count,
+        "mean": stats["mean"] + difference * weight,
+        "sum_sq_dev": stats["sum_sq_dev"] + delta["sum_sq_dev"] + difference * difference * stats["count"] * weight,
+    })
+
+
+def summary_table(cells):
+    """Before/after table for the control, target and counterfactual groups.
+
+    Returns a dict ready for ``st.table``/``pd.DataFrame`` with the means
+    before and after the intervention and the variation in percent.
+    """
+    mean = cells.mean
+    control_before, control_after = mean[0, 0], mean[0, 1]
+    target_before, target_after = mean[1, 0], mean[1, 1]
+    counterfactual_after = target_before + (control_after - control_before)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "event_data": ["before intervention", "after intervention", "variation (%)"],
+            "control_data": [control_before, control_after, ((control_after - control_before) / control_before) * 100],
+            "target_data": [target_before, target_after, ((target_after - target_before) / target_before) * 100],
+            "counterfactual_data": [target_before, counterfactual_after, ((counterfactual_after - target_before) / target_before) * 100],
+        }
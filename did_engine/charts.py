@@ -0,0 +1,197 @@
+"""Plotly figures for the analysis, sized for the browser.
+
+This module imports plotly and is therefore not imported by ``did_engine``
+itself; the statistics can be used without any plotting library.
+
+The time-series chart is built from one point per (event date, group) and,
+above a point budget, each group's line is downsampled on the server with
+Largest-Triangle-Three-Buckets or min/max per bucket, so the payload sent to
+the browser stays roughly constant however large the data is.
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from did_engine.dates import parse_dates
+
+DEFAULT_MAX_POINTS = 5_000
+DOWNSAMPLING_METHODS = ("lttb", "minmax")
+
+
+def aggregate_series(dataframe, event_date_name, metric_name, groups_name):
+    """Mean of the metric per (event date, group), sorted by date.
+
+    Text dates are converted with ``parse_dates`` so they sort and plot in
+    order.
+    """
+    series = (
+        dataframe.groupby([event_date_name, groups_name], sort=False)[metric_name]
+        .mean()
+        .reset_index()
+    )
+    series[event_date_name] = parse_dates(series[event_date_name])
+    return series.sort_values([groups_name, event_date_name], kind="stable").reset_index(drop=True)
+
+
+def _bucket_edges(n, n_buckets):
+    return np.linspace(0, n, n_buckets + 1).astype(np.intp)
+
+
+def lttb_indices(x, y, n_out):
+    """Indices of the ``n_out`` points Largest-Triangle-Three-Buckets keeps.
+
+    ``x`` must be numeric and sorted. The first and last points are always
+    kept; every bucket in between contributes the point forming the largest
+    triangle with the previously kept point and the next bucket's average.
+    Missing values are left out of the averages and only kept for a bucket
+    that has nothing else, so the chart shows the gap.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.isfinite(y)
+    edges = _bucket_edges(n - 2, n_out - 2) + 1
+    kept = np.empty(n_out, dtype=np.intp)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_stop = edges[bucket + 1], edges[bucket + 2]
+            next_finite = finite[next_start:next_stop]
+            next_x = x[next_start:next_stop].mean()
+            next_y = y[next_start:next_stop][next_finite].mean() if next_finite.any() else np.nan
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        if np.isfinite(area).any():
+            previous = start + int(np.nanargmax(area))
+        else:
+            # No triangle to compare (a missing neighbour); take the bucket's first value
+            previous = start + int(np.argmax(finite[start:stop]))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def minmax_indices(y, n_out):
+    """Indices of the first and last point and of the minimum and maximum of equal-count buckets.
+
+    There are ``(n_out - 2) // 2`` buckets, so at most ``n_out`` indices are
+    returned. Missing values are ignored; a bucket of only missing values
+    contributes nothing.
+    """
+    n = len(y)
+    n_buckets = (n_out - 2) // 2
+    if n_out >= n or n_buckets < 1:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    edges = _bucket_edges(n, n_buckets)
+    filled = np.where(np.isnan(y), np.inf, y)
+    lows = np.minimum.reduceat(filled, edges[:-1])
+    highs = np.maximum.reduceat(np.where(np.isnan(y), -np.inf, y), edges[:-1])
+    bucket_of = np.repeat(np.arange(n_buckets), np.diff(edges))
+    first_low = np.flatnonzero(y == lows[bucket_of])
+    first_high = np.flatnonzero(y == highs[bucket_of])
+    low_idx = first_low[np.unique(bucket_of[first_low], return_index=True)[1]]
+    high_idx = first_high[np.unique(bucket_of[first_high], return_index=True)[1]]
+    return np.unique(np.concatenate([[0, n - 1], low_idx, high_idx]))
+
+
+def downsample_series(series, event_date_name, metric_name, groups_name, max_points=DEFAULT_MAX_POINTS, method="lttb"):
+    """Downsample each group's line so the whole chart stays within ``max_points``."""
+    if len(series) <= max_points:
+        return series
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError("method must be one of " + ", ".join(DOWNSAMPLING_METHODS))
+    n_groups = series[groups_name].nunique()
+    per_group = max(max_points // max(n_groups, 1), 3)
+    kept = []
+    for _, group in series.groupby(groups_name, sort=False):
+        x = group[event_date_name]
+        if pd.api.types.is_datetime64_any_dtype(x):
+            x = x.astype("int64")
+        elif not pd.api.types.is_numeric_dtype(x):
+            x = np.arange(len(group))
+        y = group[metric_name].to_numpy(dtype=np.float64)
+        index = lttb_indices(x, y, per_group) if method == "lttb" else minmax_indices(y, per_group)
+        kept.append(group.iloc[index])
+    return pd.concat(kept, ignore_index=True)
+
+
+def build_timeseries_figure(chart_data, event_date_name, metric_name, groups_name,
+                            max_points=DEFAULT_MAX_POINTS, method="lttb", webgl=False):
+    """Line per group of the metric over time, aggregated and downsampled.
+
+    ``webgl`` renders with ``Scattergl`` traces, which stay responsive with
+    many more points than SVG traces.
+    """
+    series = aggregate_series(chart_data, event_date_name, metric_name, groups_name)
+    series = downsample_series(series, event_date_name, metric_name, groups_name, max_points, method)
+    trace = go.Scattergl if webgl else go.Scatter
+    fig = go.Figure()
+    for group_value, group in series.groupby(groups_name, sort=True):
+        fig.add_trace(trace(
+            x=group[event_date_name].to_numpy(),
+            y=group[metric_name].to_numpy(),
+            name=str(group_value),
+            mode="lines",
+        ))
+    fig.update_layout(xaxis_title=event_date_name, yaxis_title=metric_name, legend_title_text=groups_name)
+    return fig
+
+
+def build_sweep_figure(sweep, selected_date=None):
+    """Diff-in-diff estimate and 95% CI band against the cutover date.
+
+    ``sweep`` is the frame returned by ``sensitivity.cutover_sweep``; the
+    ``selected_date`` is marked with a vertical line and a highlighted point.
+    """
+    x = sweep["cutover_date"].to_numpy()
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=np.concatenate([x, x[::-1]]),
+        y=np.concatenate([sweep["ci_high"].to_numpy(), sweep["ci_low"].to_numpy()[::-1]]),
+        fill="toself",
+        line={"width": 0},
+        opacity=0.3,
+        hoverinfo="skip",
+        name="95% CI",
+    ))
+    fig.add_trace(go.Scatter(x=x, y=sweep["diff_in_diff"].to_numpy(), mode="lines", name="Diff-in-Diff estimate"))
+    if selected_date is not None:
+        selected = sweep[sweep["cutover_date"] == selected_date]
+        fig.add_vline(x=selected_date, line_dash="dash")
+        fig.add_trace(go.Scatter(
+            x=selected["cutover_date"].to_numpy(),
+            y=selected["diff_in_diff"].to_numpy(),
+            mode="markers",
+            marker={"size": 12},
+            name="Selected intervention date",
+        ))
+    fig.add_hline(y=0, line_width=1, line_color="gray")
+    fig.update_layout(xaxis_title="Intervention date", yaxis_title="Diff-in-Diff estimate")
+    return fig
+
+
+def build_event_study_figure(dynamic):
+    """Dynamic effects with 95% CI bars against event time (periods since adoption)."""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=dynamic["event_time"].to_numpy(),
+        y=dynamic["att"].to_numpy(),
+        mode="markers+lines",
+        error_y={"type": "data", "symmetric": False,
+                 "array": (dynamic["ci_high"] - dynamic["att"]).to_numpy(),
+                 "arrayminus": (dynamic["att"] - dynamic["ci_low"]).to_numpy()},
+        name="ATT by event time",
+    ))
+    fig.add_vline(x=-0.5, line_dash="dash")
+    fig.add_hline(y=0, line_width=1, line_color="gray")
+    fig.update_layout(xaxis_title="Periods since adoption", yaxis_title="Average treatment effect")
+    return fig
@@ -0,0 +1,55 @@
+"""Command line entry point: ``python -m did_engine``.
+
+Examples::
+
+    python -m did_engine jobs.json --output results.json
+    python -m did_engine exports/ --event-date event_date --metric deposits \\
+        --groups poa --intervention intervention --output results.parquet
+"""
+
+import argparse
+import os
+import sys
+
+from did_engine.ingest import DEFAULT_CHUNKSIZE
+from did_engine.runner import jobs_from_directory, load_manifest, run_jobs, write_results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m did_engine",
+        description="Run 2x2 Difference-in-Differences analyses on CSV, Parquet, Feather or Arrow files.",
+    )
+    parser.add_argument("source", help="a JSON manifest of jobs, or a directory of data files")
+    parser.add_argument("--event-date", help="event date column (directory mode)")
+    parser.add_argument("--metric", help="metric column (directory mode)")
+    parser.add_argument("--groups", help="0/1 groups (treatment) column (directory mode)")
+    parser.add_argument("--intervention", help="0/1 intervention (post) column (directory mode)")
+    parser.add_argument("--output", "-o", default="did_results.json", help="results file, .json or .parquet (default: %(default)s)")
+    parser.add_argument("--workers", "-j", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="CSV rows per chunk (default: %(default)s)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.source):
+        mapping = [args.event_date, args.metric, args.groups, args.intervention]
+        if None in mapping:
+            parser.error("a directory source needs --event-date, --metric, --groups and --intervention")
+        specs = jobs_from_directory(args.source, *mapping)
+    else:
+        specs = load_manifest(args.source)
+    if not specs:
+        parser.error("no jobs found in " + args.source)
+
+    records = run_jobs(specs, max_workers=args.workers, chunksize=args.chunksize)
+    write_results(records, args.output)
+
+    failed = [record for record in records if record["status"] != "ok"]
+    for record in failed:
+        print(record["name"] + ": " + record["error"], file=sys.stderr)
+    print(str(len(records) - len(failed)) + " of " + str(len(records)) + " jobs succeeded, results written to " + args.output)
+    return 1 if failed else 0
@@ -0,0 +1,40 @@
+"""One rule for ordering event dates, shared by the charts, the sweeps and the store.
+
+Dates arrive as numbers (years, period indices), as datetimes from columnar
+files, or as text from CSVs, where both of the others also show up. Numbers
+and numeric text are ordered as numbers; text is parsed as dates when every
+value is a date, element by element so mixed formats parse without pandas
+warning about an inferred format; anything else is ordered as given.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def parse_dates(values):
+    """``values`` as a Series of numbers, datetimes or, failing both, the values as given.
+
+    Missing values stay missing and do not prevent the conversion.
+    """
+    values = pd.Series(values)
+    if not (values.dtype == object or pd.api.types.is_string_dtype(values)):
+        return values
+    present = values.notna()
+    numbers = pd.to_numeric(values, errors="coerce")
+    if numbers[present].notna().all():
+        return numbers
+    parsed = pd.to_datetime(values, errors="coerce", format="mixed")
+    if parsed[present].notna().all():
+        return parsed
+    return values
+
+
+def sorted_dates(values):
+    """Distinct dates in order, after ``parse_dates``, and the code of each row.
+
+    Only the distinct values are parsed. Values that parse to the same date
+    share a code, and rows with a missing date get code -1.
+    """
+    codes, uniques = pd.factorize(pd.Series(values))
+    unique_codes, dates = pd.factorize(parse_dates(uniques), sort=True)
+    return np.where(codes >= 0, unique_codes[codes], -1), dates
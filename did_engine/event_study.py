@@ -0,0 +1,237 @@
+"""Staggered adoption: group-time ATTs and dynamic (event-time) effects.
+
+Implements the unconditional Callaway & Sant'Anna (2021) estimator on a
+balanced panel. Units are grouped into adoption cohorts by the first period
+their treated flag is 1. ATT(g, t) compares the change in the metric of
+cohort g between period g - 1 and period t with the same change in the
+comparison units: never-treated units, or units not yet treated by
+max(t, g).
+
+The panel is reduced once to per-cohort sums of the period columns, from
+which every ATT(g, t) is read with index arithmetic, so no (g, t) pair
+re-filters the data. Standard errors treat units as independent draws. They
+are accumulated one cohort at a time: ATT(g, t) only involves periods t and
+g - 1, so a cohort contributes the spread of every period minus the base
+periods g - 1 (merged into the pooled comparison groups it belongs to), and
+each of its units contributes its influence on the event-time aggregates. Memory stays in proportion to
+the panel, not to cohorts x periods x periods.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from did_engine.dates import sorted_dates
+
+CONTROL_GROUPS = ("never_treated", "not_yet_treated")
+
+
+@dataclass
+class EventStudyResult:
+    """``group_time`` has one row per (cohort, period) ATT, ``dynamic`` one per event time.
+
+    ``dropped_units`` counts units left out because they are not observed in
+    every period.
+    """
+
+    group_time: pd.DataFrame
+    dynamic: pd.DataFrame
+    n_units: int
+    dropped_units: int
+
+
+def _panel(dataframe, unit_name, period_name, metric_name, treated_name):
+    """Units x periods matrix of the metric and each unit's adoption period index."""
+    unit_codes, _ = pd.factorize(dataframe[unit_name], sort=True)
+    period_codes, periods = sorted_dates(dataframe[period_name])
+    values = pd.to_numeric(dataframe[metric_name], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    treated = dataframe[treated_name].to_numpy() == 1
+    valid = (unit_codes >= 0) & (period_codes >= 0) & ~np.isnan(values)
+    if not valid.any():
+        raise ValueError("no unit is observed in every period")
+    n_units, n_periods = int(unit_codes.max()) + 1, len(periods)
+
+    cell = unit_codes[valid] * n_periods + period_codes[valid]
+    sums = np.bincount(cell, weights=values[valid], minlength=n_units * n_periods)
+    counts = np.bincount(cell, minlength=n_units * n_periods)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        panel = (sums / counts).reshape(n_units, n_periods)
+
+    # Adoption is the first period flagged as treated; n_periods means never treated
+    adoption = np.full(n_units, n_periods)
+    flagged = valid & treated
+    np.minimum.at(adoption, unit_codes[flagged], period_codes[flagged])
+    return panel, adoption, periods
+
+
+def _cohort_variances(by_cohort, row_start, treated_cohorts, bases, pair_base, t, control, pair_event, coef, n_control, control_change,
+                      n_event_times):
+    """Variance of every ATT(g, t) and of every event-time aggregate.
+
+    Cohorts are visited from the last adopter to the first, merging the mean
+    and sum of squared deviations of each period minus each base period over
+    the comparison suffix, so a pooled comparison group's variance includes
+    the spread between its cohorts. An aggregate's variance is the sum over
+    units of their squared influence: a unit of cohort k puts ``coef`` on the
+    change of the cohort's own pairs, minus the comparison weight of every
+    pair whose comparison suffix starts at or before k, measured from the
+    comparison mean ``control_change`` of that pair. Comparison units shared
+    between cohorts are therefore accounted for.
+    """
+    n_cohorts, n_periods = len(row_start) - 1, by_cohort.shape[1]
+    own_var = np.zeros(len(t))
+    suffix_var = np.zeros(len(t))
+    dynamic_var = np.zeros(n_event_times)
+    suffix_count = 0
+    suffix_mean = np.zeros((n_periods, len(bases)))
+    suffix_sum_sq_dev = np.zeros((n_periods, len(bases)))
+
+    # Comparison weights of the pairs whose suffix includes the current cohort, as period x event time
+    usable = pair_event >= 0
+    comparison_coef = np.zeros((n_periods, n_event_times))
+    comparison = np.zeros(len(t))
+    comparison[usable] = coef[usable] / n_control[usable]
+    np.add.at(comparison_coef, (t[usable], pair_event[usable]), -comparison[usable])
+    np.add.at(comparison_coef, (bases[pair_base[usable]], pair_event[usable]), comparison[usable])
+    # Influence of a unit with the comparison mean change on every event time
+    comparison_offset = np.bincount(pair_event[usable], weights=comparison[usable] * control_change[usable], minlength=n_event_times)
+    by_control = np.argsort(control, kind="stable")
+    control_start = np.searchsorted(control[by_control], np.arange(n_cohorts + 1))
+    treated_position = np.full(n_cohorts, -1)
+    treated_position[treated_cohorts] = np.arange(len(treated_cohorts))
+
+    for k in range(n_cohorts - 1, -1, -1):
+        block = by_cohort[row_start[k]:row_start[k + 1]]
+        n_k = len(block)
+        cohort_mean = block.mean(axis=0)
+        deviations = block - cohort_mean
+        # Within-cohort variance of each period minus each base period
+        if n_k > 1:
+            period_var = np.einsum("ij,ij->j", deviations, deviations) / (n_k - 1)
+            change_var = period_var[:, None] + period_var[bases][None, :] - 2 * (deviations.T @ deviations[:, bases]) / (n_k - 1)
+            # A period minus itself has no variance; keep rounding from making it negative
+            change_var[bases, np.arange(len(bases))] = 0.0
+            np.maximum(change_var, 0.0, out=change_var)
+        else:
+            change_var = np.zeros((n_periods, len(bases)))
+        # Merge the cohort into the comparison suffix, as CellStats merges cells
+        delta = cohort_mean[:, None] - cohort_mean[bases][None, :] - suffix_mean
+        suffix_mean += delta * (n_k / (suffix_count + n_k))
+        suffix_sum_sq_dev += (n_k - 1) * change_var + delta ** 2 * (suffix_count * n_k / (suffix_count + n_k))
+        suffix_count += n_k
+        compared = by_control[control_start[k]:control_start[k + 1]]
+        if suffix_count > 1:
+            suffix_var[compared] = suffix_sum_sq_dev[t[compared], pair_base[compared]] / (suffix_count - 1)
+
+        unit_coef = comparison_coef.copy()
+        if treated_position[k] >= 0:
+            own = slice(treated_position[k] * n_periods, (treated_position[k] + 1) * n_periods)
+            own_var[own] = change_var[np.arange(n_periods), treated_position[k]]
+            keep = usable[own]
+            own_coef = coef[own][keep] / n_k
+            np.add.at(unit_coef, (t[own][keep], pair_event[own][keep]), own_coef)
+            np.add.at(unit_coef, (bases[treated_position[k]], pair_event[own][keep]), -own_coef)
+        if n_k > 1:
+            influence = deviations @ unit_coef
+            dynamic_var += n_k / (n_k - 1) * np.einsum("ij,ij->j", influence, influence)
+        # The cohort's mean influence: its own pairs are centred on it, its comparison pairs on the pooled mean
+        dynamic_var += n_k * (cohort_mean @ comparison_coef + comparison_offset) ** 2
+
+        # Pairs compared from cohort k on do not reach the earlier cohorts
+        leaving = compared[usable[compared]]
+        np.add.at(comparison_coef, (t[leaving], pair_event[leaving]), comparison[leaving])
+        np.add.at(comparison_coef, (bases[pair_base[leaving]], pair_event[leaving]), -comparison[leaving])
+        comparison_offset -= np.bincount(pair_event[leaving], weights=comparison[leaving] * control_change[leaving], minlength=n_event_times)
+    return own_var, suffix_var, dynamic_var
+
+
+def event_study(dataframe, unit_name, period_name, metric_name, treated_name,
+                control_group="never_treated", alpha=0.05):
+    """Group-time ATTs and their aggregation by event time.
+
+    ``treated_name`` is a 0/1 column that is 1 from the period a unit adopts
+    the treatment onwards. The dynamic effect at event time e averages
+    ATT(g, g + e) over cohorts weighted by cohort size.
+    """
+    if control_group not in CONTROL_GROUPS:
+        raise ValueError("control_group must be one of " + ", ".join(CONTROL_GROUPS))
+    panel, adoption, periods = _panel(dataframe, unit_name, period_name, metric_name, treated_name)
+    n_periods = len(periods)
+    balanced = ~np.isnan(panel).any(axis=1)
+    dropped_units = int((~balanced).sum())
+    if not balanced.any():
+        raise ValueError("no unit is observed in every period")
+    panel, adoption = panel[balanced], adoption[balanced]
+
+    # Cohort sums, computed once
+    cohorts, cohort_of = np.unique(adoption, return_inverse=True)
+    order = np.argsort(cohort_of, kind="stable")
+    by_cohort = panel[order]
+    starts = np.searchsorted(cohort_of[order], np.arange(len(cohorts)))
+    n = np.diff(np.append(starts, len(panel))).astype(np.float64)
+    sums = np.add.reduceat(by_cohort, starts, axis=0)
+
+    # Comparison units are always a suffix of the cohorts sorted by adoption
+    suffix_n = np.append(np.cumsum(n[::-1])[::-1], 0.0)
+    suffix_sums = np.concatenate([np.cumsum(sums[::-1], axis=0)[::-1], np.zeros((1, n_periods))])
+
+    treated_cohorts = np.flatnonzero((cohorts >= 1) & (cohorts < n_periods))
+    g = np.repeat(treated_cohorts, n_periods)
+    t = np.tile(np.arange(n_periods), len(treated_cohorts))
+    base = cohorts[g] - 1
+    if control_group == "never_treated":
+        if cohorts[-1] < n_periods:
+            raise ValueError("every unit is treated at some point; use control_group='not_yet_treated'")
+        control = np.full(len(g), len(cohorts) - 1)
+    else:
+        control = np.searchsorted(cohorts, np.maximum(t, cohorts[g]), side="right")
+    n_control = suffix_n[control]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        control_change = (suffix_sums[control, t] - suffix_sums[control, base]) / n_control
+        att = (sums[g, t] - sums[g, base]) / n[g] - control_change
+    event_time = t - cohorts[g]
+
+    # Dynamic effects: cohort-size weighted average of ATT(g, g + e) for every event time e
+    usable = np.isfinite(att) & (n_control > 0)
+    event_times, e_index = np.unique(event_time[usable], return_inverse=True)
+    weight = np.zeros(len(g))
+    weight[usable] = n[g[usable]] / np.bincount(e_index, weights=n[g[usable]])[e_index]
+    pair_event = np.full(len(g), -1)
+    pair_event[usable] = e_index
+
+    pair_base = np.repeat(np.arange(len(treated_cohorts)), n_periods)
+    own_var, suffix_var, dynamic_var = _cohort_variances(
+        by_cohort, np.append(starts, len(by_cohort)), treated_cohorts, cohorts[treated_cohorts] - 1, pair_base,
+        t, control, pair_event, weight, n_control, control_change, len(event_times))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = own_var / n[g] + suffix_var / n_control
+    std_err = np.sqrt(variance)
+    z = stats.norm.ppf(1 - alpha / 2)
+
+    group_time = pd.DataFrame({
+        "cohort": periods[cohorts[g]],
+        "period": periods[t],
+        "event_time": event_time,
+        "att": att,
+        "std_err": std_err,
+        "ci_low": att - z * std_err,
+        "ci_high": att + z * std_err,
+        "n_treated": n[g].astype(np.int64),
+        "n_control": n_control.astype(np.int64),
+    })
+
+    dynamic_att = np.bincount(e_index, weights=weight[usable] * att[usable], minlength=len(event_times))
+    dynamic_std_err = np.sqrt(dynamic_var)
+    dynamic = pd.DataFrame({
+        "event_time": event_times,
+        "att": dynamic_att,
+        "std_err": dynamic_std_err,
+        "ci_low": dynamic_att - z * dynamic_std_err,
+        "ci_high": dynamic_att + z * dynamic_std_err,
+        "cohorts": np.bincount(e_index, minlength=len(event_times)),
+    })
+    return EventStudyResult(group_time, dynamic, int(balanced.sum()), dropped_units)
+
@@ -0,0 +1,181 @@
+"""Background jobs shared by every session of the app.
+
+Heavy analyses are submitted to a bounded thread pool instead of running in
+the Streamlit script thread, so a slow fit does not hold up the session that
+started it, and a rerun does not throw the work away: the job keeps running
+and its result stays in the manager until it is evicted. Threads are used
+rather than processes because the work is NumPy/pandas code that releases the
+GIL and the jobs are closures over uploaded files, which cannot be pickled.
+
+A job function receives its :class:`Job` and calls ``job.report(done, total)``
+as it goes; that records the progress and raises :class:`JobCancelled` once
+the job has been cancelled.
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+DEFAULT_MAX_WORKERS = 2
+# Finished jobs kept for later reruns and for the latency statistics
+DEFAULT_MAX_FINISHED = 256
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled."""
+
+
+@dataclass(eq=False)
+class Job:
+    id: str
+    name: str
+    key: tuple = None
+    status: str = "queued"
+    progress: float = 0.0
+    message: str = ""
+    result: object = None
+    error: str = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+    _cancelled: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    @property
+    def cancel_requested(self):
+        return self._cancelled.is_set()
+
+    @property
+    def queue_seconds(self):
+        """Time spent waiting for a worker."""
+        if self.started_at is None:
+            return (self.finished_at or time.time()) - self.submitted_at
+        return self.started_at - self.submitted_at
+
+    @property
+    def run_seconds(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def report(self, done, total=None, message=None):
+        """Record progress (``done / total``) and stop the job if it was cancelled."""
+        if self._cancelled.is_set():
+            raise JobCancelled(self.id)
+        if total:
+            self.progress = min(max(done / total, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+
+class JobManager:
+    """Bounded pool of worker threads running :class:`Job` objects.
+
+    ``submit`` with a ``key`` returns the job already running, queued or done
+    for that key, so the same analysis requested twice (or by two sessions)
+    runs once. Failed and cancelled jobs are resubmitted.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, max_finished=DEFAULT_MAX_FINISHED):
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="did-job")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._by_key = {}
+        self._ids = itertools.count(1)
+
+    def submit(self, function, name="job", key=None):
+        """Run ``function(job)`` in the pool and return the :class:`Job`."""
+        with self._lock:
+            if key is not None and key in self._by_key:
+                job = self._jobs.get(self._by_key[key])
+                if job is not None and job.status not in ("failed", "cancelled"):
+                    return job
+            job = Job(id=str(next(self._ids)), name=name, key=key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._by_key[key] = job.id
+        self._pool.submit(self._run, job, function)
+        return job
+
+    def _run(self, job, function):
+        with self._lock:
+            # Cancelled while it was queued
+            if job.cancel_requested:
+                return
+            job.status = "running"
+            job.started_at = time.time()
+        try:
+            result = function(job)
+        except JobCancelled:
+            self._finish(job, "cancelled")
+        except Exception as error:
+            job.error = type(error).__name__ + ": " + str(error)
+            self._finish(job, "failed")
+        else:
+            job.result = result
+            job.progress = 1.0
+            self._finish(job, "done")
+
+    def _finish(self, job, status):
+        job.finished_at = time.time()
+        job.status = status
+        with self._lock:
+            finished = [job_id for job_id, other in self._jobs.items() if other.finished]
+            for job_id in finished[: max(len(finished) - self.max_finished, 0)]:
+                evicted = self._jobs.pop(job_id)
+                if evicted.key is not None and self._by_key.get(evicted.key) == job_id:
+                    del self._by_key[evicted.key]
+
+    def get(self, job_id):
+        """The job with ``job_id``, or ``None`` if it is unknown or was evicted."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Ask a job to stop; queued jobs never start, running jobs stop at their next report."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return
+            job._cancelled.set()
+            queued = job.status == "queued"
+        if queued:
+            self._finish(job, "cancelled")
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stats(self):
+        """Queue depth and latency figures for sizing the pool."""
+        jobs = self.jobs()
+        finished = [job for job in jobs if job.status == "done"]
+        run_seconds = np.array([job.run_seconds for job in finished])
+        queue_seconds = np.array([job.queue_seconds for job in finished])
+        return {
+            "workers": self.max_workers,
+            "queued": sum(job.status == "queued" for job in jobs),
+            "running": sum(job.status == "running" for job in jobs),
+            "done": len(finished),
+            "failed": sum(job.status == "failed" for job in jobs),
+            "cancelled": sum(job.status == "cancelled" for job in jobs),
+            "mean_queue_seconds": float(queue_seconds.mean()) if len(finished) else None,
+            "mean_run_seconds": float(run_seconds.mean()) if len(finished) else None,
+            "p95_run_seconds": float(np.percentile(run_seconds, 95)) if len(finished) else None,
+        }
+
+    def shutdown(self, wait=True):
+        for job in self.jobs():
+            job._cancelled.set()
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,187 @@
+"""Bootstrap and permutation inference for the diff-in-diff estimate.
+
+The classical OLS standard errors assume independent errors, which does not
+hold for serially correlated panels. Here the rows are grouped into clusters
+(units, or blocks of consecutive dates) and each cluster is reduced to its
+2x2 cell statistics once. A replicate is then a weighted sum of cluster
+statistics, so a batch of replicates is one matrix product followed by the
+closed-form estimator, with no refitting on the rows. Batches can be spread
+over a process pool.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from did_engine.cells import CellStats, cell_codes
+from did_engine.regression import closed_form
+from did_engine.dates import sorted_dates
+
+DEFAULT_REPLICATES = 2_000
+BATCH_SIZE = 500
+
+
+@dataclass
+class ClusterStats:
+    """2x2 cell statistics of each cluster, as a ``(clusters, 12)`` matrix.
+
+    Columns are count, sum and sum of squares for the cells in
+    ``[treat, post]`` order, so any weighting of clusters is ``weights @
+    matrix``. Sums are taken around ``shift``, one value per cell shared by
+    every cluster (see ``CellStats``).
+    """
+
+    matrix: np.ndarray
+    shift: np.ndarray = 0.0
+
+    @classmethod
+    def from_frame(cls, dataframe, metric_name, groups_name, intervention_date_name,
+                   cluster_name=None, event_date_name=None, block_length=1):
+        """Cluster by ``cluster_name`` or, failing that, by blocks of dates.
+
+        Date blocks are ``block_length`` consecutive distinct event dates.
+        """
+        if cluster_name is not None:
+            cluster_codes = pd.factorize(dataframe[cluster_name], sort=True)[0]
+        elif event_date_name is not None:
+            cluster_codes = sorted_dates(dataframe[event_date_name])[0]
+            cluster_codes = np.where(cluster_codes >= 0, cluster_codes // max(int(block_length), 1), -1)
+        else:
+            raise ValueError("either cluster_name or event_date_name is required")
+
+        values = pd.to_numeric(dataframe[metric_name], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        codes, valid = cell_codes(dataframe[groups_name].to_numpy(), dataframe[intervention_date_name].to_numpy())
+        valid &= (cluster_codes >= 0) & ~np.isnan(values)
+        n_clusters = int(cluster_codes.max()) + 1 if len(cluster_codes) else 0
+        shift = CellStats.from_codes(codes[valid], values[valid]).mean
+        cells = CellStats.from_codes(4 * cluster_codes[valid] + codes[valid], values[valid], n_groups=n_clusters).shifted(np.nan_to_num(shift))
+        matrix = np.concatenate([array.reshape(n_clusters, 4) for array in (cells.count, cells.total, cells.total_sq)], axis=1)
+        # Clusters without usable rows carry no information
+        return cls(matrix[matrix[:, :4].sum(axis=1) > 0], np.nan_to_num(shift))
+
+    @property
+    def n_clusters(self):
+        return len(self.matrix)
+
+    def combine(self, weights):
+        """Cells of each row of ``weights`` (shape ``(replicates, clusters)``)."""
+        combined = weights @ self.matrix
+        return CellStats(*(combined[:, 4 * i:4 * (i + 1)].reshape(-1, 2, 2) for i in range(3)), self.shift)
+
+    def reshifted(self, shift):
+        """The same clusters with the sums taken around ``shift``."""
+        cells = CellStats(*(self.matrix[:, 4 * i:4 * (i + 1)].reshape(-1, 2, 2) for i in range(3)), self.shift).shifted(shift)
+        matrix = np.concatenate([array.reshape(-1, 4) for array in (cells.count, cells.total, cells.total_sq)], axis=1)
+        return ClusterStats(matrix, np.zeros((2, 2)) + shift)
+
+    def estimate(self):
+        return float(closed_form(self.combine(np.ones((1, self.n_clusters))))[0][0, 3])
+
+
+@dataclass
+class BootstrapResult:
+    estimate: float
+    std_err: float
+    ci_low: float
+    ci_high: float
+    replicates: np.ndarray
+
+
+@dataclass
+class PermutationResult:
+    estimate: float
+    p_value: float
+    replicates: np.ndarray
+
+
+def _bootstrap_batch(clusters, n_replicates, seed):
+    rng = np.random.default_rng(seed)
+    weights = rng.multinomial(clusters.n_clusters, np.full(clusters.n_clusters, 1.0 / clusters.n_clusters), size=n_replicates)
+    return closed_form(clusters.combine(weights.astype(np.float64)))[0][:, 3]
+
+
+def _permuted_axis(matrix):
+    """Cell axis (1 = treat, 2 = post) whose flag is constant within every cluster."""
+    count = matrix[:, :4].reshape(-1, 2, 2)
+    for axis in (1, 2):
+        per_flag = count.sum(axis=3 - axis)
+        if ((per_flag[:, 0] == 0) | (per_flag[:, 1] == 0)).all():
+            return axis
+    raise ValueError("permutation needs clusters that are each entirely in one group (units) "
+                     "or entirely before or after the intervention (dates)")
+
+
+def _permutation_batch(clusters, n_replicates, seed):
+    rng = np.random.default_rng(seed)
+    axis = _permuted_axis(clusters.matrix)
+    # Folding adds cells along the permuted axis, so they need one shift
+    count = clusters.matrix[:, :4].sum(axis=0).reshape(2, 2)
+    folded_shift = (count * clusters.shift).sum(axis=axis - 1, keepdims=True) / np.maximum(count.sum(axis=axis - 1, keepdims=True), 1)
+    clusters = clusters.reshifted(np.broadcast_to(folded_shift, (2, 2)))
+    matrix = clusters.matrix
+    labels = (matrix[:, :4].reshape(-1, 2, 2).sum(axis=3 - axis)[:, 1] > 0).astype(np.float64)
+    assigned = rng.permuted(np.broadcast_to(labels, (n_replicates, len(labels))), axis=1)
+
+    # Fold each cluster onto the flag-0 and the flag-1 cells; the permuted labels pick one
+    by_stat = matrix.reshape(-1, 3, 2, 2)
+    folded = by_stat.sum(axis=axis + 1, keepdims=True)
+    zeros = np.zeros_like(folded)
+    as_one = np.concatenate([zeros, folded], axis=axis + 1).reshape(len(matrix), -1)
+    as_zero = np.concatenate([folded, zeros], axis=axis + 1).reshape(len(matrix), -1)
+    combined = (assigned @ as_one + (1 - assigned) @ as_zero).reshape(-1, 3, 2, 2)
+    return closed_form(CellStats(combined[:, 0], combined[:, 1], combined[:, 2], clusters.shift))[0][:, 3]
+
+
+def _run_batches(batch, clusters, replicates, seed, max_workers, progress):
+    """Run ``batch`` over replicate batches, serially or in a process pool."""
+    sizes = [min(BATCH_SIZE, replicates - start) for start in range(0, replicates, BATCH_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    results = [None] * len(sizes)
+    done = 0
+    if max_workers and max_workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(batch, clusters, size, child): i for i, (size, child) in enumerate(zip(sizes, seeds))}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                done += sizes[futures[future]]
+                if progress is not None:
+                    progress(done, replicates)
+    else:
+        for i, (size, child) in enumerate(zip(sizes, seeds)):
+            results[i] = batch(clusters, size, child)
+            done += size
+            if progress is not None:
+                progress(done, replicates)
+    return np.concatenate(results) if results else np.empty(0)
+
+
+def bootstrap(clusters, replicates=DEFAULT_REPLICATES, alpha=0.05, seed=None, max_workers=None, progress=None):
+    """Cluster (or date block) bootstrap of the diff-in-diff estimate.
+
+    Clusters are drawn with replacement; replicates that leave a cell empty
+    are dropped. Returns the bootstrap standard error and percentile CI.
+    ``progress(done, total)`` is called after every batch.
+    """
+    draws = _run_batches(_bootstrap_batch, clusters, replicates, seed, max_workers, progress)
+    draws = draws[np.isfinite(draws)]
+    if len(draws) == 0:
+        return BootstrapResult(clusters.estimate(), np.nan, np.nan, np.nan, draws)
+    ci_low, ci_high = np.quantile(draws, [alpha / 2, 1 - alpha / 2])
+    return BootstrapResult(clusters.estimate(), float(draws.std(ddof=1)) if len(draws) > 1 else np.nan,
+                           float(ci_low), float(ci_high), draws)
+
+
+def permutation_test(clusters, replicates=DEFAULT_REPLICATES, seed=None, max_workers=None, progress=None):
+    """Two-sided permutation p-value of the diff-in-diff estimate.
+
+    Unit clusters have their treat labels shuffled; date clusters have their
+    post labels shuffled, i.e. placebo intervention periods.
+    """
+    _permuted_axis(clusters.matrix)
+    estimate = clusters.estimate()
+    draws = _run_batches(_permutation_batch, clusters, replicates, seed, max_workers, progress)
+    draws = draws[np.isfinite(draws)]
+    p_value = (1 + np.count_nonzero(np.abs(draws) >= abs(estimate))) / (len(draws) + 1)
+    return PermutationResult(estimate, float(p_value), draws)
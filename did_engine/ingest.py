@@ -0,0 +1,243 @@
+"""Reading analysis data, including uploads too large to hold in memory.
+
+CSV is read with pandas. Parquet, Feather and Arrow IPC files are read with
+pyarrow, which is imported on first use: only the requested columns are
+decoded and files on disk are memory-mapped instead of copied.
+"""
+
+import io
+import os
+import uuid
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from did_engine.cells import CellStats, cell_codes
+from did_engine.dates import parse_dates
+
+DEFAULT_CHUNKSIZE = 1_000_000
+PREVIEW_ROWS = 1_000
+SAMPLE_CACHE_DIR = ".sample_cache"
+
+# File extension -> format understood by read_columns and read_preview.
+FILE_FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "arrow",
+    ".arrow": "arrow",
+    ".ipc": "arrow",
+}
+
+
+@dataclass
+class StreamedData:
+    """What a chunked read keeps of a file: no row-level data survives.
+
+    ``series`` has one row per (event date, group) with the metric mean under
+    the metric column name, which is all the time-series chart needs.
+    """
+
+    cells: CellStats
+    series: pd.DataFrame
+    nrows: int
+
+
+class BufferFile(io.RawIOBase):
+    """Read-only binary file over a buffer, such as an upload's ``getbuffer()``.
+
+    Reads copy only the bytes asked for, and every ``BufferFile`` has its own
+    position, so a background job and the script thread can read the same
+    upload at the same time without a copy of it.
+    """
+
+    def __init__(self, buffer, name=None):
+        self._view = memoryview(buffer).toreadonly().cast("B")
+        self._position = 0
+        self.name = name
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, target):
+        chunk = self._view[self._position:self._position + len(target)]
+        target[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def readall(self):
+        data = self._view[self._position:].tobytes()
+        self._position = len(self._view)
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        start = {os.SEEK_SET: 0, os.SEEK_CUR: self._position, os.SEEK_END: len(self._view)}[whence]
+        self._position = max(start + offset, 0)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def getbuffer(self):
+        return self._view
+
+
+def file_format(name):
+    """Format of a file from its name, ``"csv"`` when the extension is unknown."""
+    return FILE_FORMATS.get(os.path.splitext(str(name))[1].lower(), "csv")
+
+
+def _arrow_source(source):
+    """Memory-map paths; wrap uploaded file objects without copying them again."""
+    import pyarrow as pa
+
+    if isinstance(source, (str, os.PathLike)):
+        return pa.memory_map(os.fspath(source))
+    if hasattr(source, "getbuffer"):
+        return pa.BufferReader(source.getbuffer())
+    source.seek(0)
+    return pa.BufferReader(source.read())
+
+
+def _open_arrow(source):
+    """Open a Feather v2 / Arrow IPC file, falling back to the streaming format."""
+    import pyarrow as pa
+
+    try:
+        return pa.ipc.open_file(_arrow_source(source))
+    except pa.ArrowInvalid:
+        return pa.ipc.open_stream(_arrow_source(source))
+
+
+def read_columns(source, columns=None, fmt=None):
+    """Read ``columns`` (all when ``None``) of a CSV, Parquet or Arrow file.
+
+    ``fmt`` defaults to the format implied by the file name. Columnar formats
+    only decode the requested columns.
+    """
+    fmt = fmt or file_format(getattr(source, "name", source))
+    if hasattr(source, "seek"):
+        source.seek(0)
+    if fmt == "csv":
+        return pd.read_csv(source, usecols=columns)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(source, columns=columns, memory_map=isinstance(source, (str, os.PathLike))).to_pandas()
+    table = _open_arrow(source).read_all()
+    return (table if columns is None else table.select(columns)).to_pandas()
+
+
+def read_preview(source, nrows=PREVIEW_ROWS, fmt=None):
+    """First ``nrows`` rows of a file, for showing the data and its columns."""
+    fmt = fmt or file_format(getattr(source, "name", source))
+    if hasattr(source, "seek"):
+        source.seek(0)
+    if fmt == "csv":
+        return pd.read_csv(source, nrows=nrows)
+    import pyarrow as pa
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(source)
+        batch = next(parquet_file.iter_batches(batch_size=nrows), None)
+        if batch is None:
+            return parquet_file.schema_arrow.empty_table().to_pandas()
+        return pa.Table.from_batches([batch]).to_pandas()
+    reader = _open_arrow(source)
+    if hasattr(reader, "num_record_batches"):
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    else:
+        batches = iter(reader)
+    rows, taken = 0, []
+    for batch in batches:
+        taken.append(batch.slice(0, nrows - rows))
+        rows += taken[-1].num_rows
+        if rows >= nrows:
+            break
+    return pa.Table.from_batches(taken, schema=reader.schema).to_pandas()
+
+
+def read_sample(csv_path):
+    """Read a shipped sample CSV through a memory-mapped Feather copy.
+
+    The copy is written to ``SAMPLE_CACHE_DIR`` the first time a sample is
+    read and refreshed when the CSV is newer. The copy is written to a
+    temporary file and renamed into place, so a crash or a concurrent writer
+    never leaves a truncated copy behind. If the cache cannot be written
+    (read-only deployments) the CSV is parsed as before.
+    """
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(csv_path)), SAMPLE_CACHE_DIR)
+    feather_path = os.path.join(cache_dir, os.path.splitext(os.path.basename(csv_path))[0] + ".feather")
+    if not os.path.exists(feather_path) or os.path.getmtime(feather_path) < os.path.getmtime(csv_path):
+        dataframe = pd.read_csv(csv_path)
+        tmp_path = feather_path + ".tmp-" + uuid.uuid4().hex
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Uncompressed so the file can be memory-mapped on the next read
+            dataframe.to_feather(tmp_path, compression="uncompressed")
+            os.replace(tmp_path, feather_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return dataframe
+    return read_columns(feather_path, fmt="arrow")
+
+
+def stream_csv(source, event_date_name, metric_name, groups_name, intervention_date_name,
+               chunksize=DEFAULT_CHUNKSIZE, metric_dtype="float64", progress=None):
+    """Aggregate a CSV chunk by chunk, keeping only the four analysis columns.
+
+    The metric and the flags are converted to numbers chunk by chunk, and
+    rows with a missing or non-numeric metric or a flag other than 0/1 are
+    skipped, as ``CellStats.from_frame`` does, rather than failing the read.
+    The metric is held as ``metric_dtype`` (``"float32"`` halves its
+    footprint). Peak memory is bounded by ``chunksize`` and the number of
+    distinct (date, group) pairs, not by the size of the file.
+    ``progress(bytes_read, total_bytes)`` is called after every chunk.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            return stream_csv(file, event_date_name, metric_name, groups_name, intervention_date_name,
+                              chunksize, metric_dtype, progress)
+    total_bytes = source.seek(0, os.SEEK_END)
+    source.seek(0)
+    reader = pd.read_csv(
+        source,
+        usecols=[event_date_name, metric_name, groups_name, intervention_date_name],
+        dtype={event_date_name: str},
+        chunksize=chunksize,
+    )
+
+    cells = CellStats.empty()
+    series = None
+    nrows = 0
+    with reader:
+        for chunk in reader:
+            nrows += len(chunk)
+            values = pd.to_numeric(chunk[metric_name], errors="coerce").to_numpy(dtype=metric_dtype, na_value=np.nan)
+            treat, post = (pd.to_numeric(chunk[name], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+                           for name in (groups_name, intervention_date_name))
+            codes, valid = cell_codes(treat, post)
+            valid &= ~np.isnan(values)
+            cells = cells + CellStats.from_codes(codes[valid], values[valid])
+
+            kept = pd.DataFrame({event_date_name: chunk[event_date_name].to_numpy()[valid],
+                                 groups_name: treat[valid].astype(np.int8), metric_name: values[valid]})
+            chunk_series = kept.groupby([event_date_name, groups_name])[metric_name].agg(["sum", "count"])
+            series = chunk_series if series is None else series.add(chunk_series, fill_value=0)
+            if progress is not None:
+                progress(min(source.tell(), total_bytes), total_bytes)
+
+    if series is None:
+        series = pd.DataFrame(columns=[event_date_name, groups_name, metric_name])
+    else:
+        series = (series["sum"] / series["count"]).rename(metric_name).reset_index()
+        # Dates are read as text; give them back as numbers or dates so they sort
+        series[event_date_name] = parse_dates(series[event_date_name])
+    return StreamedData(cells=cells, series=series, nrows=nrows)
@@ -0,0 +1,123 @@
+"""Wall time, memory and row counts of each stage of an analysis.
+
+Wrap each stage in ``profiler.stage(name)``; every finished stage is kept on
+the profiler and logged as one JSON line on the ``did_engine.profiling``
+logger, so runs can be compared over time and across datasets.
+
+Memory is the process resident set size at the end of the stage (from
+psutil when it is installed, ``/proc`` on Linux otherwise) and how much the
+process peak resident set size rose during the stage. The operating system
+only keeps the peak over the life of the process, so a stage that stays
+below an earlier peak shows no increase: the increase is a lower bound on
+the memory the stage needed, not its own peak. With ``trace_allocations``
+the peak of Python and NumPy allocations during the stage is recorded as
+well, through :mod:`tracemalloc`; that slows the stage down, and because the
+tracer is process-wide, stages running at the same time in other threads are
+counted too.
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+import pandas as pd
+
+logger = logging.getLogger("did_engine.profiling")
+
+
+@dataclass
+class StageRecord:
+    stage: str
+    seconds: float = None
+    rows: int = None
+    rss_bytes: int = None
+    peak_rss_increase_bytes: int = None
+    allocated_bytes: int = None
+
+
+def rss_bytes():
+    """Current resident set size of the process, or ``None`` when unknown."""
+    try:
+        import psutil
+    except ImportError:
+        try:
+            with open("/proc/self/statm") as file:
+                return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            return None
+    return psutil.Process().memory_info().rss
+
+
+def peak_rss_bytes():
+    """Peak resident set size of the process so far, or ``None`` when unknown."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Profiler:
+    """Collects a :class:`StageRecord` per stage of one run.
+
+    ``context`` (file name, content hash, columns...) is added to every log
+    line so slow stages can be traced back to the dataset.
+    """
+
+    def __init__(self, name="analysis", context=None, trace_allocations=False):
+        self.name = name
+        self.context = dict(context or {})
+        self.trace_allocations = trace_allocations
+        self.records = []
+
+    @contextmanager
+    def stage(self, stage, rows=None):
+        """Time the ``with`` block; set ``record.rows`` inside it if the count is only known then."""
+        record = StageRecord(stage=stage, rows=rows)
+        started_tracing = False
+        if self.trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+        peak_before = peak_rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - start
+            if self.trace_allocations:
+                record.allocated_bytes = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+            record.rss_bytes = rss_bytes()
+            peak_after = peak_rss_bytes()
+            if peak_before is not None and peak_after is not None:
+                record.peak_rss_increase_bytes = peak_after - peak_before
+            self.records.append(record)
+            logger.info(json.dumps({"run": self.name, **self.context, **asdict(record)}, default=str))
+
+    def extend(self, other):
+        """Append the stages recorded by another profiler, e.g. one run in a worker thread."""
+        self.records.extend(other.records)
+        return self
+
+    @property
+    def total_seconds(self):
+        return sum(record.seconds for record in self.records)
+
+    def to_frame(self):
+        frame = pd.DataFrame([asdict(record) for record in self.records], columns=list(StageRecord.__dataclass_fields__))
+        frame["share"] = frame["seconds"] / self.total_seconds if self.records else []
+        return frame
+
+    def to_json(self):
+        return json.dumps({"run": self.name, "context": self.context, "total_seconds": self.total_seconds,
+                           "stages": [asdict(record) for record in self.records]}, indent=2, default=str)
@@ -0,0 +1,105 @@
+"""Closed-form fit of the saturated ``metric ~ treat * post`` model.
+
+With two binary regressors and their interaction the OLS design is saturated:
+the fitted values are the four cell means, so every coefficient, standard
+error, t statistic, p-value and confidence interval can be written in terms
+of the cell counts, means and within-cell sums of squares held by
+:class:`~did_engine.cells.CellStats`. No design matrix is built and the cost
+does not depend on the number of rows.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# Columns of the statsmodels coefficient table this result mirrors.
+SUMMARY_COLUMNS = ["coef", "std err", "t", "P>|t|", "[0.025", "0.975]"]
+
+
+def closed_form(cells):
+    """Coefficients, standard errors and residual degrees of freedom.
+
+    Works on stacked cells: the coefficient axis (Intercept, treat, post,
+    treat:post) is appended after the leading axes of ``cells``.
+    """
+    n = cells.count
+    mean = cells.mean
+    params = np.stack([
+        mean[..., 0, 0],
+        mean[..., 1, 0] - mean[..., 0, 0],
+        mean[..., 0, 1] - mean[..., 0, 0],
+        mean[..., 1, 1] - mean[..., 1, 0] - mean[..., 0, 1] + mean[..., 0, 0],
+    ], axis=-1)
+
+    df_resid = cells.nobs - 4
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma2 = cells.sum_sq_dev.sum(axis=(-2, -1)) / df_resid
+        inv = 1.0 / n
+    var_factor = np.stack([
+        inv[..., 0, 0],
+        inv[..., 1, 0] + inv[..., 0, 0],
+        inv[..., 0, 1] + inv[..., 0, 0],
+        inv.sum(axis=(-2, -1)),
+    ], axis=-1)
+    bse = np.sqrt(sigma2[..., None] * var_factor)
+    return params, bse, df_resid
+
+
+@dataclass
+class DiDRegression:
+    """Coefficient table of the ``metric ~ treat * post`` regression.
+
+    The four entries of each array follow ``terms``: the intercept (control
+    group before the intervention), the treat and post main effects and the
+    treat:post interaction, which is the diff-in-diff estimate.
+    """
+
+    terms: list
+    params: np.ndarray
+    bse: np.ndarray
+    tvalues: np.ndarray
+    pvalues: np.ndarray
+    conf_int_low: np.ndarray
+    conf_int_high: np.ndarray
+    nobs: int
+    df_resid: int
+
+    @property
+    def diff_in_diff(self):
+        return self.params[3]
+
+    def to_frame(self):
+        return pd.DataFrame(
+            np.column_stack([self.params, self.bse, self.tvalues, self.pvalues, self.conf_int_low, self.conf_int_high]),
+            index=self.terms, columns=SUMMARY_COLUMNS,
+        )
+
+    def summary_frame(self):
+        """``to_frame`` rounded the way the statsmodels summary prints it."""
+        return self.to_frame().round({"coef": 4, "std err": 3, "t": 3, "P>|t|": 3, "[0.025": 3, "0.975]": 3})
+
+
+def fit_cells(cells, groups_name="treat", intervention_date_name="post", alpha=0.05):
+    """Fit the saturated diff-in-diff regression from cell statistics.
+
+    Term names follow the patsy formula ``metric ~ groups * intervention`` so
+    the table reads the same as the statsmodels one.
+    """
+    params, bse, df_resid = closed_form(cells)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tvalues = params / bse
+    pvalues = 2 * stats.t.sf(np.abs(tvalues), df_resid)
+    margin = stats.t.ppf(1 - alpha / 2, df_resid) * bse
+    return DiDRegression(
+        terms=["Intercept", str(groups_name), str(intervention_date_name), str(groups_name) + ":" + str(intervention_date_name)],
+        params=params,
+        bse=bse,
+        tvalues=tvalues,
+        pvalues=pvalues,
+        conf_int_low=params - margin,
+        conf_int_high=params + margin,
+        nobs=int(cells.nobs),
+        df_resid=int(df_resid),
+    )
@@ -0,0 +1,154 @@
+"""Run 2x2 diff-in-diff jobs outside the app, one per file, in parallel.
+
+A job is a data file plus its column mapping. CSV files are streamed in
+chunks and columnar files only have the four analysis columns read, so a job
+never holds more than it needs. Only pandas, numpy, scipy and (for columnar
+files) pyarrow are imported, which keeps worker start-up short.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+
+import numpy as np
+import pandas as pd
+
+from did_engine.cells import CellStats
+from did_engine.ingest import DEFAULT_CHUNKSIZE, FILE_FORMATS, file_format, read_columns, stream_csv
+from did_engine.profiling import Profiler
+from did_engine.regression import fit_cells
+
+
+@dataclass
+class JobSpec:
+    """One analysis: a file and the columns to use from it."""
+
+    path: str
+    event_date_name: str
+    metric_name: str
+    groups_name: str
+    intervention_date_name: str
+    name: str = None
+
+    def __post_init__(self):
+        if self.name is None:
+            self.name = os.path.splitext(os.path.basename(self.path))[0]
+
+
+def _job_fields():
+    return [field.name for field in fields(JobSpec)]
+
+
+def load_manifest(path):
+    """Job specs from a JSON manifest.
+
+    The manifest is either a list of jobs or an object with a ``jobs`` list
+    and optional ``defaults`` applied to every job. Each job needs ``path``
+    and the column mapping; relative paths are resolved against the
+    manifest's directory.
+    """
+    with open(path, encoding="utf-8") as file:
+        manifest = json.load(file)
+    if isinstance(manifest, list):
+        manifest = {"jobs": manifest}
+    defaults = manifest.get("defaults", {})
+    base_dir = os.path.dirname(os.path.abspath(path))
+    specs = []
+    for job in manifest["jobs"]:
+        job = {**defaults, **job}
+        job["path"] = os.path.join(base_dir, job["path"])
+        unknown = set(job) - set(_job_fields())
+        if unknown:
+            raise ValueError("unknown job fields in manifest: " + ", ".join(sorted(unknown)))
+        specs.append(JobSpec(**job))
+    return specs
+
+
+def jobs_from_directory(directory, event_date_name, metric_name, groups_name, intervention_date_name):
+    """One job per supported data file in ``directory``, all with the same columns."""
+    return [
+        JobSpec(os.path.join(directory, entry), event_date_name, metric_name, groups_name, intervention_date_name)
+        for entry in sorted(os.listdir(directory))
+        if os.path.splitext(entry)[1].lower() in FILE_FORMATS
+    ]
+
+
+def _float(value):
+    return None if not np.isfinite(value) else float(value)
+
+
+def run_job(spec, chunksize=DEFAULT_CHUNKSIZE):
+    """Run one job and return a JSON-serialisable record.
+
+    Failures are reported in the record (``status`` ``"error"``) rather than
+    raised, so one bad file does not stop a batch.
+    """
+    start = time.perf_counter()
+    record = {"name": spec.name, "path": spec.path}
+    profiler = Profiler("job", context={"name": spec.name, "path": spec.path})
+    try:
+        with profiler.stage("read"):
+            if file_format(spec.path) == "csv":
+                cells = stream_csv(spec.path, spec.event_date_name, spec.metric_name, spec.groups_name,
+                                   spec.intervention_date_name, chunksize=chunksize).cells
+            else:
+                columns = list(dict.fromkeys([spec.metric_name, spec.groups_name, spec.intervention_date_name]))
+                cells = CellStats.from_frame(read_columns(spec.path, columns), spec.metric_name, spec.groups_name,
+                                             spec.intervention_date_name)
+        with profiler.stage("regression", rows=int(cells.nobs.sum())):
+            regression = fit_cells(cells, spec.groups_name, spec.intervention_date_name)
+    except (OSError, ValueError, KeyError, ImportError) as error:
+        record.update(status="error", error=type(error).__name__ + ": " + str(error))
+    else:
+        mean = cells.mean
+        record.update(
+            status="ok",
+            nobs=regression.nobs,
+            diff_in_diff=_float(regression.params[3]),
+            std_err=_float(regression.bse[3]),
+            p_value=_float(regression.pvalues[3]),
+            ci_low=_float(regression.conf_int_low[3]),
+            ci_high=_float(regression.conf_int_high[3]),
+            control_before=_float(mean[0, 0]),
+            control_after=_float(mean[0, 1]),
+            target_before=_float(mean[1, 0]),
+            target_after=_float(mean[1, 1]),
+            coefficients=[
+                {"term": term, "coef": _float(coef), "std_err": _float(se), "t": _float(t), "p_value": _float(p),
+                 "ci_low": _float(low), "ci_high": _float(high)}
+                for term, coef, se, t, p, low, high in zip(
+                    regression.terms, regression.params, regression.bse, regression.tvalues, regression.pvalues,
+                    regression.conf_int_low, regression.conf_int_high)
+            ],
+        )
+    for stage in profiler.records:
+        record[stage.stage + "_seconds"] = stage.seconds
+    increases = [stage.peak_rss_increase_bytes for stage in profiler.records]
+    record["peak_rss_increase_bytes"] = sum(increases) if increases and None not in increases else None
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+
+def run_jobs(specs, max_workers=None, chunksize=DEFAULT_CHUNKSIZE):
+    """Run jobs across ``max_workers`` processes (all cores by default), in order."""
+    specs = list(specs)
+    if max_workers == 1 or len(specs) <= 1:
+        return [run_job(spec, chunksize) for spec in specs]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(run_job, specs, [chunksize] * len(specs)))
+
+
+def write_results(records, path):
+    """Write job records as JSON, or as one Parquet row per job.
+
+    Parquet keeps the headline columns; the full coefficient table of each
+    job is only in the JSON output.
+    """
+    if file_format(path) == "parquet":
+        frame = pd.DataFrame([{key: value for key, value in record.items() if key != "coefficients"} for record in records])
+        frame.to_parquet(path, index=False)
+    else:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(records, file, indent=2)
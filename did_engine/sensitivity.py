@@ -0,0 +1,149 @@
+"""Diff-in-diff estimate for every candidate intervention date in one pass.
+
+The data is reduced once to count, sum and sum of squares per (event date,
+group), taken around each group's mean. Cumulative sums over the sorted dates then give the before/after
+cells for every cutover date, so K candidate dates cost O(n + K) rather than
+K refits. Estimates at dates other than the real intervention double as
+placebo tests. CSVs too large for memory are reduced chunk by chunk with
+``stream_cutover_sweep``.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from did_engine.cells import CellStats, merge_summaries
+from did_engine.dates import sorted_dates
+from did_engine.ingest import DEFAULT_CHUNKSIZE
+from did_engine.regression import closed_form
+
+
+def date_group_stats(dataframe, event_date_name, metric_name, groups_name):
+    """Count, sum and sum of squares of the metric per (event date, group).
+
+    Returns the sorted dates, three ``(dates, 2)`` arrays indexed
+    ``[date, treat]`` and the mean of each group, around which the sums are
+    taken. Rows whose group is not 0/1 or whose metric is missing are skipped.
+    """
+    codes, dates = sorted_dates(dataframe[event_date_name])
+    treat = dataframe[groups_name].to_numpy()
+    values = pd.to_numeric(dataframe[metric_name], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = (codes >= 0) & ((treat == 0) | (treat == 1)) & ~np.isnan(values)
+    keys = 2 * codes[valid] + (treat[valid] == 1)
+    values = values[valid]
+    group = keys % 2
+    group_count = np.bincount(group, minlength=2)
+    shift = np.divide(np.bincount(group, weights=values, minlength=2), group_count,
+                      out=np.zeros(2), where=group_count > 0)
+    values = values - shift[group]
+    minlength = 2 * len(dates)
+    count = np.bincount(keys, minlength=minlength).astype(np.float64).reshape(-1, 2)
+    total = np.bincount(keys, weights=values, minlength=minlength).reshape(-1, 2)
+    total_sq = np.bincount(keys, weights=values * values, minlength=minlength).reshape(-1, 2)
+    return dates, count, total, total_sq, shift
+
+
+def cells_by_cutover(count, total, total_sq, shift=0.0):
+    """Stacked 2x2 cells for a cutover at each date from per-date statistics.
+
+    Entry ``k`` treats dates ``< k`` as before and dates ``>= k`` as after the
+    intervention, for ``k`` in ``1 .. dates - 1``. ``shift`` is the value per
+    group the sums are taken around.
+    """
+    def split(per_date):
+        before = np.cumsum(per_date, axis=0)[:-1]
+        after = per_date.sum(axis=0) - before
+        return np.stack([before, after], axis=-1)
+
+    before_after = split(count)
+    shift = np.zeros_like(before_after) + np.asarray(shift, dtype=np.float64).reshape(-1, 1)
+    return CellStats(before_after, split(total), split(total_sq), shift)
+
+
+def cutover_sweep(dataframe, event_date_name, metric_name, groups_name, alpha=0.05):
+    """Estimate, standard error and CI of the diff-in-diff at every cutover date.
+
+    Each row treats ``cutover_date`` as the first date after the intervention.
+    Cutovers that leave a cell empty give NaN.
+    """
+    return _sweep(*date_group_stats(dataframe, event_date_name, metric_name, groups_name), alpha)
+
+
+def _sweep(dates, count, total, total_sq, shift, alpha):
+    cells = cells_by_cutover(count, total, total_sq, shift)
+    params, bse, df_resid = closed_form(cells)
+    margin = stats.t.ppf(1 - alpha / 2, df_resid) * bse[:, 3]
+    return pd.DataFrame({
+        "cutover_date": dates[1:],
+        "diff_in_diff": params[:, 3],
+        "std_err": bse[:, 3],
+        "ci_low": params[:, 3] - margin,
+        "ci_high": params[:, 3] + margin,
+        "nobs_before": cells.count[:, :, 0].sum(axis=1).astype(np.int64),
+        "nobs_after": cells.count[:, :, 1].sum(axis=1).astype(np.int64),
+    })
+
+
+def stream_cutover_sweep(source, event_date_name, metric_name, groups_name, intervention_date_name, alpha=0.05,
+                         chunksize=DEFAULT_CHUNKSIZE):
+    """``cutover_sweep`` and ``first_flagged_date`` of a CSV read chunk by chunk.
+
+    Between chunks only the count, mean and sum of squared deviations of the
+    metric per (event date, group) and the dates seen and flagged are kept,
+    so memory grows with the number of dates, not with the file. Returns the
+    sweep and the first flagged date.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            return stream_cutover_sweep(file, event_date_name, metric_name, groups_name, intervention_date_name, alpha, chunksize)
+    source.seek(0)
+    reader = pd.read_csv(
+        source,
+        usecols=list(dict.fromkeys([event_date_name, metric_name, groups_name, intervention_date_name])),
+        dtype={event_date_name: str},
+        chunksize=chunksize,
+    )
+
+    summaries = None
+    seen_dates, flagged_dates = set(), set()
+    with reader:
+        for chunk in reader:
+            dates = chunk[event_date_name]
+            seen_dates.update(dates.dropna().unique())
+            flagged_dates.update(dates[pd.to_numeric(chunk[intervention_date_name], errors="coerce") == 1].dropna().unique())
+            values = pd.to_numeric(chunk[metric_name], errors="coerce")
+            treat = pd.to_numeric(chunk[groups_name], errors="coerce")
+            valid = dates.notna() & treat.isin([0, 1]) & values.notna()
+            grouped = values[valid].groupby([dates[valid], treat[valid].astype(np.int8)])
+            size = grouped.size().astype(np.float64)
+            delta = pd.DataFrame({"count": size, "mean": grouped.mean(), "sum_sq_dev": grouped.var(ddof=0) * size})
+            summaries = delta if summaries is None else merge_summaries(summaries, delta)
+
+    # Dates were read as text, which sorted_dates orders as read_csv's numbers or dates would be
+    date_text = pd.Series(sorted(seen_dates), dtype=object)
+    codes, dates = sorted_dates(date_text)
+    code_of = dict(zip(date_text, codes))
+    count, mean, sum_sq_dev = (np.zeros((len(dates), 2)) for _ in range(3))
+    if summaries is not None and len(summaries):
+        date_code = np.array([code_of[date] for date in summaries.index.get_level_values(0)])
+        group = summaries.index.get_level_values(1).to_numpy()
+        count[date_code, group] = summaries["count"].to_numpy()
+        mean[date_code, group] = summaries["mean"].to_numpy()
+        sum_sq_dev[date_code, group] = summaries["sum_sq_dev"].to_numpy()
+
+    # Sums around each group's mean, as date_group_stats takes them
+    group_count = count.sum(axis=0)
+    shift = np.divide((count * mean).sum(axis=0), group_count, out=np.zeros(2), where=group_count > 0)
+    offset = mean - shift
+    flagged = [code_of[date] for date in flagged_dates]
+    first_date = dates[min(flagged)] if flagged else None
+    return _sweep(dates, count, count * offset, sum_sq_dev + count * offset * offset, shift, alpha), first_date
+
+
+def first_flagged_date(dataframe, event_date_name, intervention_date_name):
+    """Earliest event date where the intervention column is 1, or ``None``."""
+    codes, dates = sorted_dates(dataframe[event_date_name])
+    flagged = codes[(dataframe[intervention_date_name].to_numpy() == 1) & (codes >= 0)]
+    return dates[flagged.min()] if len(flagged) else None
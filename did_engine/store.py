@@ -0,0 +1,285 @@
+"""Persistent sufficient statistics for analyses that grow over time.
+
+A named analysis keeps, on disk, the count, mean and sum of squared
+deviations of the metric per (event date, group, intervention) plus a fingerprint of every row
+ingested so far. Appending new rows only aggregates the new rows and merges
+them into the stored statistics, so updating the estimates costs time in
+proportion to the new data, not the full history.
+
+Rows are fingerprinted on a row key chosen when the analysis is created (an
+event id, or the unit and date), or else on every column of the first
+upload. The k-th copy of a row within one upload is told apart from the
+first, so genuine repeats inside an upload are kept, while rows that were
+already ingested are skipped.
+"""
+
+import json
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from did_engine.cells import CellStats, cell_codes, merge_summaries
+from did_engine.dates import parse_dates
+
+DEFAULT_STORE_DIR = ".did_store"
+# Fingerprint segments are merged into one once there are more than this many
+MAX_SEGMENTS = 32
+STAT_COLUMNS = ["count", "mean", "sum_sq_dev"]
+# Seconds an append waits for another append to the same analysis
+LOCK_TIMEOUT = 60.0
+
+
+@dataclass
+class AppendReport:
+    new_rows: int
+    duplicate_rows: int
+    skipped_rows: int
+
+
+def row_fingerprints(dataframe, columns):
+    """64-bit fingerprint of each row's ``columns``, numbering repeats within the frame."""
+    row_hash = pd.util.hash_pandas_object(dataframe[columns], index=False).to_numpy()
+    occurrence = pd.Series(row_hash).groupby(row_hash).cumcount().to_numpy()
+    return pd.util.hash_pandas_object(pd.DataFrame({"row": row_hash, "occurrence": occurrence}), index=False).to_numpy()
+
+
+def _canonical_values(values):
+    """Values as one text form, so a row fingerprints alike whatever dtype the upload gave it.
+
+    Values are read with ``parse_dates``: numbers (and numeric text) are
+    written as floats, dates as ``YYYY-MM-DD`` (with the time when it is not
+    midnight), and anything else as text.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    parsed = parse_dates(uniques)
+    if pd.api.types.is_numeric_dtype(parsed) and not pd.api.types.is_bool_dtype(parsed):
+        text = parsed.astype(np.float64).astype(str)
+    elif pd.api.types.is_datetime64_any_dtype(parsed):
+        text = parsed.dt.strftime("%Y-%m-%d %H:%M:%S").str.removesuffix(" 00:00:00")
+    else:
+        text = parsed.astype(str)
+    return pd.Series(text.to_numpy(dtype=object)[codes], index=values.index)
+
+
+def _save_array(path, array):
+    with open(path, "wb") as file:
+        np.save(file, array)
+
+
+def _write_atomic(path, write):
+    tmp_path = path + ".tmp-" + uuid.uuid4().hex
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _locked(path, timeout=LOCK_TIMEOUT):
+    """Hold the lock file ``path`` (created exclusively) for the ``with`` block."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                raise TimeoutError("another append holds " + path + "; remove it if no append is running") from None
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.remove(path)
+
+
+class IncrementalAnalysis:
+    """One named analysis in an on-disk store.
+
+    ``meta.json`` is written last on every append and names the statistics
+    file and fingerprint segments in use, so an interrupted append leaves the
+    previous state intact. Appends hold ``append.lock`` in the analysis
+    directory and start from the ``meta.json`` on disk, so concurrent appends
+    from several sessions or processes are applied one after the other.
+    """
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+
+    @property
+    def name(self):
+        return self.meta["name"]
+
+    @property
+    def column_mapping(self):
+        return [self.meta[key] for key in ("event_date_name", "metric_name", "groups_name", "intervention_date_name")]
+
+    @property
+    def row_columns(self):
+        """Columns rows are fingerprinted on, or ``None`` until the first upload fixes them."""
+        return self.meta["row_columns"]
+
+    @classmethod
+    def create(cls, store_dir, name, event_date_name, metric_name, groups_name, intervention_date_name, row_key=None):
+        """Create an empty analysis.
+
+        ``row_key`` names the column (or list of columns) that identifies a
+        row. By default every column of the first upload is used.
+        """
+        path = os.path.join(store_dir, _directory_name(name))
+        if os.path.exists(os.path.join(path, "meta.json")):
+            raise ValueError("an analysis called " + repr(name) + " already exists")
+        os.makedirs(path, exist_ok=True)
+        meta = {
+            "name": name,
+            "event_date_name": event_date_name,
+            "metric_name": metric_name,
+            "groups_name": groups_name,
+            "intervention_date_name": intervention_date_name,
+            "row_columns": [row_key] if isinstance(row_key, str) else row_key,
+            "nrows": 0,
+            "stats_file": None,
+            "segments": [],
+        }
+        analysis = cls(path, meta)
+        analysis._write_meta()
+        return analysis
+
+    @classmethod
+    def open(cls, store_dir, name):
+        path = os.path.join(store_dir, _directory_name(name))
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as file:
+            return cls(path, json.load(file))
+
+    def _read_meta(self):
+        with open(os.path.join(self.path, "meta.json"), encoding="utf-8") as file:
+            self.meta = json.load(file)
+
+    def _write_meta(self):
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(self.meta, file, indent=2)
+
+        _write_atomic(os.path.join(self.path, "meta.json"), write)
+
+    def stats(self):
+        """Stored count, mean and sum of squared deviations per (event date, group, intervention)."""
+        event_date_name, _, groups_name, intervention_date_name = self.column_mapping
+        if self.meta["stats_file"] is None:
+            return pd.DataFrame(columns=[event_date_name, groups_name, intervention_date_name] + STAT_COLUMNS)
+        return pd.read_parquet(os.path.join(self.path, self.meta["stats_file"]))
+
+    def _already_ingested(self, fingerprints):
+        seen = np.zeros(len(fingerprints), dtype=bool)
+        for segment in self.meta["segments"]:
+            stored = np.load(os.path.join(self.path, segment), mmap_mode="r")
+            position = np.searchsorted(stored, fingerprints)
+            found = position < len(stored)
+            found[found] = stored[position[found]] == fingerprints[found]
+            seen |= found
+        return seen
+
+    def append(self, dataframe):
+        """Merge the rows of ``dataframe`` that were not ingested before."""
+        event_date_name, metric_name, groups_name, intervention_date_name = self.column_mapping
+        frame = dataframe[[event_date_name, metric_name, groups_name, intervention_date_name]].copy()
+        frame[metric_name] = pd.to_numeric(frame[metric_name], errors="coerce")
+        _, valid = cell_codes(frame[groups_name].to_numpy(), frame[intervention_date_name].to_numpy())
+        valid &= frame[metric_name].notna().to_numpy() & frame[event_date_name].notna().to_numpy()
+        skipped_rows = int((~valid).sum())
+        frame = frame[valid]
+        # One dtype per column, so CSV and columnar uploads of the same rows fingerprint alike
+        frame[metric_name] = frame[metric_name].astype(np.float64)
+        frame[groups_name] = frame[groups_name].astype("int8")
+        frame[intervention_date_name] = frame[intervention_date_name].astype("int8")
+        frame[event_date_name] = _canonical_values(frame[event_date_name])
+        row_columns = self.row_columns or list(dataframe.columns)
+        fingerprints = self._fingerprints(dataframe, valid, frame, row_columns)
+
+        with _locked(os.path.join(self.path, "append.lock")):
+            self._read_meta()
+            if self.row_columns is None:
+                self.meta["row_columns"] = row_columns
+            elif self.row_columns != row_columns:
+                # Another session's first upload fixed the row columns meanwhile
+                fingerprints = self._fingerprints(dataframe, valid, frame, self.row_columns)
+            return self._append(frame, fingerprints, skipped_rows)
+
+    @staticmethod
+    def _fingerprints(dataframe, valid, frame, row_columns):
+        """Fingerprints of the ``valid`` rows on ``row_columns``, taking analysis columns from the cleaned ``frame``."""
+        keys = pd.DataFrame({column: frame[column] if column in frame.columns else _canonical_values(dataframe[column][valid])
+                             for column in row_columns})
+        return row_fingerprints(keys, row_columns)
+
+    def _append(self, frame, fingerprints, skipped_rows):
+        event_date_name, metric_name, groups_name, intervention_date_name = self.column_mapping
+        seen = self._already_ingested(fingerprints)
+        new = frame[~seen]
+        report = AppendReport(new_rows=len(new), duplicate_rows=int(seen.sum()), skipped_rows=skipped_rows)
+        if len(new) == 0:
+            return report
+
+        keys = [event_date_name, groups_name, intervention_date_name]
+        grouped = new.groupby(keys)[metric_name]
+        delta = pd.DataFrame({"count": grouped.size().astype(np.float64), "mean": grouped.mean(),
+                              "sum_sq_dev": grouped.var(ddof=0) * grouped.size()})
+        merged = delta if self.meta["stats_file"] is None else merge_summaries(self.stats().set_index(keys), delta)
+        version = uuid.uuid4().hex[:12]
+        stats_file = "stats-" + version + ".parquet"
+        _write_atomic(os.path.join(self.path, stats_file), lambda tmp_path: merged.reset_index().to_parquet(tmp_path, index=False, engine="pyarrow"))
+
+        segment = "rows-" + version + ".npy"
+        _write_atomic(os.path.join(self.path, segment), lambda tmp_path: _save_array(tmp_path, np.sort(fingerprints[~seen])))
+        segments = self.meta["segments"] + [segment]
+        if len(segments) > MAX_SEGMENTS:
+            compacted = "rows-" + version + "-all.npy"
+            everything = np.unique(np.concatenate([np.load(os.path.join(self.path, name)) for name in segments]))
+            _write_atomic(os.path.join(self.path, compacted), lambda tmp_path: _save_array(tmp_path, everything))
+            segments = [compacted]
+
+        replaced = [self.meta["stats_file"]] + [name for name in self.meta["segments"] + [segment] if name not in segments]
+        self.meta.update(nrows=self.meta["nrows"] + len(new), stats_file=stats_file, segments=segments)
+        self._write_meta()
+        for name in replaced:
+            if name is not None and os.path.exists(os.path.join(self.path, name)):
+                os.remove(os.path.join(self.path, name))
+        return report
+
+    def cells(self):
+        """2x2 cell statistics of everything ingested so far."""
+        _, _, groups_name, intervention_date_name = self.column_mapping
+        stats = self.stats()
+        codes, valid = cell_codes(stats[groups_name].to_numpy(), stats[intervention_date_name].to_numpy())
+        return CellStats.from_summaries(codes[valid], *(stats[column].to_numpy(dtype=np.float64)[valid] for column in STAT_COLUMNS))
+
+    def series(self):
+        """Mean of the metric per (event date, group), for the time-series chart."""
+        event_date_name, metric_name, groups_name, _ = self.column_mapping
+        stats = self.stats()
+        per_date = stats.assign(total=stats["count"] * stats["mean"]).groupby([event_date_name, groups_name])[["count", "total"]].sum()
+        series = (per_date["total"] / per_date["count"]).rename(metric_name).reset_index()
+        # Dates are stored as text; give them back as numbers or dates so they sort
+        series[event_date_name] = parse_dates(series[event_date_name])
+        return series
+
+
+def _directory_name(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("._") or "analysis"
+
+
+def list_analyses(store_dir=DEFAULT_STORE_DIR):
+    """Names of the analyses in ``store_dir``."""
+    if not os.path.isdir(store_dir):
+        return []
+    names = []
+    for entry in sorted(os.listdir(store_dir)):
+        meta_path = os.path.join(store_dir, entry, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as file:
+                names.append(json.load(file)["name"])
+    return names
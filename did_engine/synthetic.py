@@ -0,0 +1,67 @@
+"""Synthetic Difference-in-Differences panels with a known effect.
+
+Each unit has its own level and every period a common shock, so the groups
+differ before the intervention and both move over time; only the treated
+units after the intervention get ``effect`` on top. The noise of each unit
+follows an AR(1) process with correlation ``autocorrelation`` between
+consecutive periods and standard deviation ``noise``, which is what makes
+plain OLS standard errors too small on real panels.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_panel(units=1000, periods=52, treated_share=0.5, effect=1.0, noise=1.0, autocorrelation=0.0,
+                    intervention_period=None, start="2020-01-06", freq="W-MON", seed=0, first_unit=0, period_seed=None):
+    """A balanced panel of ``units * periods`` rows in the layout of the sample files.
+
+    Columns are ``unit``, ``event_date`` (text, like the CSV samples),
+    ``metric``, ``treat`` (0/1 group) and ``post`` (0/1, from
+    ``intervention_period``, the middle period by default). ``first_unit``
+    offsets the unit ids and ``period_seed`` (``seed`` by default) fixes the
+    period shocks, so panels generated in pieces can be concatenated.
+    """
+    if not 0 <= autocorrelation < 1:
+        raise ValueError("autocorrelation must be in [0, 1)")
+    rng = np.random.default_rng(seed)
+    intervention_period = periods // 2 if intervention_period is None else intervention_period
+
+    treat = (rng.random(units) < treated_share).astype(np.int8)
+    unit_level = rng.normal(10.0, 2.0, units) + 0.5 * treat
+    period_rng = rng if period_seed is None else np.random.default_rng(period_seed)
+    period_shock = np.cumsum(period_rng.normal(0.05, 0.2, periods))
+    post = (np.arange(periods) >= intervention_period).astype(np.int8)
+
+    # Stationary AR(1) noise, one period at a time for all units
+    errors = np.empty((units, periods))
+    errors[:, 0] = rng.normal(0.0, noise, units)
+    innovation_scale = noise * np.sqrt(1 - autocorrelation ** 2)
+    for period in range(1, periods):
+        errors[:, period] = autocorrelation * errors[:, period - 1] + rng.normal(0.0, innovation_scale, units)
+
+    metric = unit_level[:, None] + period_shock[None, :] + effect * treat[:, None] * post[None, :] + errors
+    dates = pd.date_range(start, periods=periods, freq=freq).strftime("%Y-%m-%d").to_numpy()
+    return pd.DataFrame({
+        "unit": np.repeat(np.arange(first_unit, first_unit + units), periods),
+        "event_date": np.tile(dates, units),
+        "metric": metric.ravel(),
+        "treat": np.repeat(treat, periods),
+        "post": np.tile(post, units),
+    })
+
+
+def write_synthetic_csv(path, units=1000, periods=52, chunk_units=100_000, seed=0, **options):
+    """Write a synthetic panel to CSV ``chunk_units`` units at a time; returns the number of rows.
+
+    Memory is bounded by the chunk, so panels far larger than memory can be
+    written. ``options`` are passed on to :func:`synthetic_panel`.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(max(-(-units // chunk_units), 1))
+    nrows = 0
+    for index, first_unit in enumerate(range(0, units, chunk_units)):
+        chunk = synthetic_panel(min(chunk_units, units - first_unit), periods, seed=seeds[index], first_unit=first_unit,
+                                period_seed=seed, **options)
+        chunk.to_csv(path, mode="w" if index == 0 else "a", header=index == 0, index=False)
+        nrows += len(chunk)
+    return nrows
@@ -1,8 +1,19 @@
+import logging
+import os
+import pathlib
+
 import streamlit as st
 import pandas as pd
-import statsmodels.formula.api as smf
 import plotly.graph_objects as go
-import plotly.express as px
+
+from did_engine import BufferFile, CellStats, ClusterStats, ResultCache, batch_diff_in_diff, bootstrap, content_hash, cutover_sweep, event_study, file_format, first_flagged_date, fit_cells, list_analyses, permutation_test, read_columns, read_preview, read_sample, stream_csv, stream_cutover_sweep, summary_table
+from did_engine.batch import CORRECTIONS
+from did_engine.charts import DEFAULT_MAX_POINTS, build_event_study_figure, build_sweep_figure, build_timeseries_figure
+from did_engine.event_study import CONTROL_GROUPS
+from did_engine.executor import JobManager
+from did_engine.inference import DEFAULT_REPLICATES
+from did_engine.profiling import Profiler
+from did_engine.store import DEFAULT_STORE_DIR, IncrementalAnalysis
 
 # Set the title and favicon that appear in the Browser's tab bar.
 st.set_page_config(
@@ -15,6 +26,311 @@ st.set_page_config(
     }
 )
 
+
+# -----------------------------------------------------------------------------
+# Cache shared by every session: parsed files, cell statistics, regression
+# results and figures, keyed by the file content hash and the selected columns
+
+
+@st.cache_resource
+def get_result_cache():
+     return ResultCache(max_entries=128, max_bytes=2 << 30, ttl=3600)
+
+
+result_cache = get_result_cache()
+
+
+def uploaded_file_hash(uploaded_file):
+     # Hash each upload once per session instead of on every rerun
+     uploaded_file_hashes = st.session_state.setdefault('uploaded_file_hashes', {})
+     if uploaded_file.file_id not in uploaded_file_hashes:
+          uploaded_file_hashes[uploaded_file.file_id] = content_hash(uploaded_file)
+     return uploaded_file_hashes[uploaded_file.file_id]
+
+
+def cached_diff_in_diff_results(key, load_cells, chart_data, event_date_name, metric_name, groups_name, intervention_date_name, chart_settings, profiler=None):
+     profiler = profiler or Profiler()
+     key = key + (event_date_name, metric_name, groups_name, intervention_date_name)
+     with profiler.stage('cell statistics') as stage:
+          cells = result_cache.get_or_compute(key + ('cells',), load_cells)
+          stage.rows = int(cells.nobs.sum())
+     return result_cache.get_or_compute(key + ('results',) + tuple(chart_settings.values()),
+                                        lambda: build_diff_in_diff_results(cells, chart_data, event_date_name, metric_name, groups_name, intervention_date_name, chart_settings, profiler))
+
+
+@st.cache_resource
+def configure_profile_log():
+     # Stage timings are logged as JSON lines; DID_PROFILE_LOG keeps them in a file
+     if os.environ.get("DID_PROFILE_LOG"):
+          profile_logger = logging.getLogger("did_engine.profiling")
+          profile_logger.setLevel(logging.INFO)
+          profile_logger.addHandler(logging.FileHandler(os.environ["DID_PROFILE_LOG"]))
+
+
+configure_profile_log()
+
+
+def trace_allocations_input(key_suffix):
+     return st.checkbox("Trace memory allocations (slower)", key='trace_allocations_' + key_suffix,
+                        help="Adds the peak of Python and NumPy allocations of every stage to the Performance panel.")
+
+
+def performance_panel(profilers, key_suffix):
+     with st.expander("Performance"):
+          profiler = Profiler(profilers[0].name, profilers[0].context)
+          for other in profilers:
+               profiler.extend(other)
+          st.caption('Wall time, memory and rows of every stage of the last run. Stages whose results were already cached are not run again.')
+          st.dataframe(profiler.to_frame(), hide_index=True)
+          st.download_button(
+          label="Download timings (JSON)",
+          data=profiler.to_json(),
+          file_name="diff-in-diff-timings.json",
+          mime="application/json",
+          key='download_timings_' + key_suffix
+          )
+
+
+# Analyses of uploaded files run in a pool of worker threads shared by every
+# session, so they survive reruns and a big upload does not block the others
+
+
+@st.cache_resource
+def get_job_manager():
+     return JobManager(max_workers=int(os.environ.get("DID_JOB_WORKERS", 2)))
+
+
+job_manager = get_job_manager()
+
+
+def diff_in_diff_job(upload_buffer, upload_hash, uploaded_file_format, dataframe, metric_dtype, column_mapping, chart_settings, profiler):
+     # Returns the job function; it reads the upload through its own read-only
+     # view so the script thread can keep using the uploaded file while the job runs
+     def run(job):
+          source = BufferFile(upload_buffer)
+          if metric_dtype is not None:
+               job.report(0, 1, "Reading the file in chunks")
+               with profiler.stage('read (chunked CSV)') as stage:
+                    streamed = result_cache.get_or_compute((upload_hash, 'streamed', metric_dtype) + tuple(column_mapping),
+                                                           lambda: stream_csv(source, *column_mapping, metric_dtype=metric_dtype,
+                                                                              progress=lambda done, total: job.report(0.9 * done, total)))
+                    stage.rows = streamed.nrows
+               job.report(0.9, 1, "Fitting the model and building the charts")
+               results = cached_diff_in_diff_results((upload_hash, metric_dtype), lambda: streamed.cells, streamed.series, *column_mapping, chart_settings, profiler)
+               return dict(results, caption=str(streamed.nrows) + ' rows read in chunks', profiler=profiler)
+          frame = dataframe
+          if uploaded_file_format != "csv":
+               job.report(0, 1, "Reading the selected columns")
+               with profiler.stage('read (' + uploaded_file_format + ' columns)') as stage:
+                    frame = result_cache.get_or_compute((upload_hash, 'columns') + tuple(column_mapping), lambda: read_columns(source, column_mapping, fmt=uploaded_file_format))
+                    stage.rows = len(frame)
+          job.report(0.5, 1, "Fitting the model and building the charts")
+          results = cached_diff_in_diff_results((upload_hash,), lambda: CellStats.from_frame(frame, *column_mapping[1:]), frame, *column_mapping, chart_settings, profiler)
+          return dict(results, profiler=profiler)
+
+     return run
+
+
+@st.fragment(run_every=1)
+def job_status(job_id):
+     # Polls the job every second without rerunning the whole page, and reruns
+     # the page once it has finished so the results are drawn
+     job = job_manager.get(job_id)
+     if job is None or job.finished:
+          st.rerun()
+     job_stats = job_manager.stats()
+     st.progress(job.progress, text=job.message or job.status.capitalize())
+     st.caption('Job ' + job.id + ' ' + job.status + ' for ' + str(round(job.queue_seconds + job.run_seconds)) + 's. '
+                + str(job_stats['running']) + ' running and ' + str(job_stats['queued']) + ' queued on ' + str(job_stats['workers']) + ' workers.')
+     if st.button("Cancel", key='cancel_job_' + job.id, disabled=job.cancel_requested):
+          job_manager.cancel(job.id)
+
+
+def chart_settings_input(key_suffix):
+     with st.expander("Chart options"):
+          max_points = st.number_input("Maximum points in the Current Data chart", min_value=100, value=DEFAULT_MAX_POINTS, step=500, key='max_points_' + key_suffix,
+                                       help="The chart shows the mean per date and group. Longer series are downsampled on the server so the page stays responsive.")
+          method = st.radio("Downsampling method", ["lttb", "minmax"], horizontal=True, key='downsampling_method_' + key_suffix,
+                            format_func=lambda method: {"lttb": "Largest triangle (LTTB)", "minmax": "Min/max per bucket"}[method])
+          webgl = st.checkbox("Render with WebGL", key='webgl_' + key_suffix)
+     return {'max_points': int(max_points), 'method': method, 'webgl': webgl}
+
+
+# -----------------------------------------------------------------------------
+# Shared analysis output for the sample and the uploaded data
+
+
+def build_diff_in_diff_results(cells, chart_data, event_date_name, metric_name, groups_name, intervention_date_name, chart_settings, profiler=None):
+     # cells holds the count, sum and sum of squares of every treat x post cell,
+     # chart_data is the raw data or its per-date means when the file was streamed,
+     # it is reduced to one point per date and group and downsampled for the browser
+     profiler = profiler or Profiler()
+     with profiler.stage('summary table'):
+          sample_summary_data_table = summary_table(cells)
+          df_summary_data = pd.DataFrame(data=sample_summary_data_table)
+     # The saturated treat*post regression has a closed form in the cell statistics
+     with profiler.stage('regression'):
+          table_results = fit_cells(cells, groups_name, intervention_date_name).summary_frame()
+
+     with profiler.stage('time-series figure', rows=len(chart_data)):
+          fig_actual_data = build_timeseries_figure(chart_data, event_date_name, metric_name, groups_name, **chart_settings)
+
+     x = list(df_summary_data['event_data'][0:2])
+     fig_diff_data = go.Figure()
+     fig_diff_data.add_trace(go.Scatter(
+     x=x,
+     y=list(df_summary_data['control_data'][0:2]),
+     name = 'Control group', # Style name/legend entry with html tags
+     connectgaps=False # override default to connect the gaps
+     ))
+     fig_diff_data.add_trace(go.Scatter(
+     x=x,
+     y=list(df_summary_data['target_data'][0:2]),
+     name='Target group',
+     ))
+     fig_diff_data.add_trace(go.Scatter(
+     x=x,
+     y=list(df_summary_data['counterfactual_data'][0:2]),
+     name='Counterfactual',
+     ))
+
+     return {'sample_summary_data_table': sample_summary_data_table, 'df_summary_data': df_summary_data,
+             'table_results': table_results, 'fig_actual_data': fig_actual_data, 'fig_diff_data': fig_diff_data}
+
+
+def run_diff_in_diff_analysis(results):
+     sample_summary_data_table = results['sample_summary_data_table']
+     table_results = results['table_results']
+
+     tab_actual_data, tab_diff_data, tab_regression = st.tabs(["Current Data", "Diff-in-Diff Analysis","Regression Model / Explanation"])
+
+     with tab_actual_data:
+
+          st.plotly_chart(results['fig_actual_data'], theme="streamlit")
+     with tab_diff_data:
+
+          st.plotly_chart(results['fig_diff_data'], theme="streamlit")
+          st.table(results['df_summary_data'])
+          st.markdown('**Control group**')
+          st.caption("This is the group with no intervention at all, you will use it as for comparing with the target group which will receive the intervention / change planned.")
+          st.markdown('**Target group**')
+          st.caption("This is the group which will get the intervention / change planned, you will use it as for comparing with the control group and check how the metrics change over time.")
+          st.markdown('**Counterfactual group**')
+          st.caption("This is a group similar to the target group in a scenario when the intervention doesn’t happen at all, the variation will be similar to the control group.")
+
+
+     with tab_regression:
+          p_value_list = list([table_results.iat[0, 3], table_results.iat[1, 3],table_results.iat[2, 3], table_results.iat[3, 3]])
+          #results_variables = np.where(table_results['P>|t|'] >= 0.05, 'is not statistically significant', 'is statistically significant')
+          st.table(table_results)
+          list_variables = list([str(table_results.index[0]), str(table_results.index[1]), str(table_results.index[2]), str(table_results.index[3])])
+          st.write(table_results.index[0], ': This is the metric of your control group before the intervention. The base value is', table_results.iat[0, 0])
+          st.write('The standard error for the intercept is ', table_results.iat[0, 1], ' which means the estimated value could vary by approximately ',  table_results.iat[0, 1] , ' units from the base value.')
+          st.write('The p-value is ', p_value_list[0], '. The closer to 0, the higher the metric.')
+          st.write('We are 95 per cent confident that the true value of the control group metric falls between ', table_results.iat[0, 4], ' and ',  table_results.iat[0, 5])
+          st.write(table_results.index[1], ': The value is the difference between the control group (', round(sample_summary_data_table['control_data'][0], 2) , ') and the target group metric (', round(sample_summary_data_table['target_data'][0], 2), ') . The value is ', table_results.iat[1, 0])
+          st.write('The standard error is ', table_results.iat[1, 1], ' which means the estimated value could vary by approximately ',  table_results.iat[1, 1] , ' units from the base value.')
+          st.write('The p-value is ', p_value_list[1], '. The closer to 0, the higher the metric')
+          st.write('We are 95 per cent confident that the true ', table_results.index[1],  ' value falls between ', table_results.iat[1, 4], ' and ',  table_results.iat[1, 5])
+          st.write(table_results.index[2], ': This is the value of the intervention effect or the difference between the metric before (', round(sample_summary_data_table['control_data'][0], 2),') and after the intervention (', round(sample_summary_data_table['control_data'][1], 2),') in the control group. The value is ', table_results.iat[2, 0])
+          st.write('The standard error is ',  table_results.iat[2, 1], ' which means the estimated value could vary by approximately ',  table_results.iat[2, 1], ' units from the base value.')
+          st.write('The p-value is ', p_value_list[2], '. The closer to 0, the higher the base value.')
+          st.write('We are 95 per cent confident that the true ', table_results.index[2], 'value falls between ', table_results.iat[2, 4], ' and ',  table_results.iat[2, 5])
+          st.write(table_results.index[3], ': The value is the difference between the counterfactual group (', round(sample_summary_data_table['counterfactual_data'][1], 2), ') and the target group (', round(sample_summary_data_table['target_data'][1], 2), ') after the intervention. The value is ', table_results.iat[3, 0])
+          st.write('The standard error is ', table_results.iat[3, 1], ' which means the estimated value could vary by approximately ',  table_results.iat[3, 1] , ' units from the base value.')
+          st.write('The p-value is ', p_value_list[3], '. The closer to 0, the higher the base value.')
+          st.write('We are 95 per cent confident that the true ', table_results.index[3],' value falls between ', table_results.iat[3, 4], ' and ',  table_results.iat[3, 5])
+
+
+
+def intervention_date_sensitivity(key, load_data, event_date_name, metric_name, groups_name, intervention_date_name, key_suffix, large_csv=None):
+     with st.expander("Intervention date sensitivity / placebo dates"):
+          st.caption("Estimates the Diff-in-Diff for every possible intervention date using only the event date column. A robust effect should appear around the real intervention date and be close to 0 at placebo dates.")
+          if not st.toggle("Run the sensitivity sweep", key='run_sweep_' + key_suffix):
+               return
+          sweep_key = key + ('sweep', event_date_name, metric_name, groups_name)
+          # The first date flagged by the intervention column is the default cutover
+          if large_csv is None:
+               sweep = result_cache.get_or_compute(sweep_key, lambda: cutover_sweep(load_data(), event_date_name, metric_name, groups_name))
+               first_post_date = result_cache.get_or_compute(sweep_key + (intervention_date_name,), lambda: first_flagged_date(load_data(), event_date_name, intervention_date_name))
+          else:
+               # Large CSVs are reduced chunk by chunk instead of being loaded
+               sweep, first_post_date = result_cache.get_or_compute(sweep_key + (intervention_date_name, 'chunked'), lambda: stream_cutover_sweep(
+                    large_csv, event_date_name, metric_name, groups_name, intervention_date_name))
+          candidate_dates = list(sweep['cutover_date'])
+          if not candidate_dates:
+               st.write("At least two distinct event dates are needed.")
+               return
+          selected_date = st.select_slider("Intervention date", candidate_dates, key='sweep_date_' + key_suffix,
+                                           value=first_post_date if first_post_date in candidate_dates else candidate_dates[len(candidate_dates) // 2])
+          st.plotly_chart(build_sweep_figure(sweep, selected_date), theme="streamlit")
+          st.dataframe(sweep, hide_index=True)
+
+
+def resampling_job_function(resampling_key, load_data, event_date_name, metric_name, groups_name, intervention_date_name, cluster_name, block_length, replicates):
+     # Replicates run serially in the job's worker thread; the job manager
+     # bounds how many resampling runs the server does at once
+     def run(job):
+          job.report(0, 1, "Computing the cluster statistics")
+          clusters = result_cache.get_or_compute(resampling_key + ('clusters',), lambda: ClusterStats.from_frame(load_data(), metric_name, groups_name, intervention_date_name,
+                                                                                                                 cluster_name=cluster_name, event_date_name=event_date_name, block_length=block_length))
+          bootstrap_result = result_cache.get_or_compute(resampling_key + ('bootstrap',), lambda: bootstrap(
+               clusters, replicates, seed=0,
+               progress=lambda done, total: job.report(done, 2 * total, "Bootstrap: " + str(done) + " / " + str(total) + " replicates")))
+          try:
+               permutation_result = result_cache.get_or_compute(resampling_key + ('permutation',), lambda: permutation_test(
+                    clusters, replicates, seed=0,
+                    progress=lambda done, total: job.report(total + done, 2 * total, "Permutation test: " + str(done) + " / " + str(total) + " replicates")))
+          except ValueError as error:
+               return {'clusters': clusters, 'bootstrap': bootstrap_result, 'permutation': None, 'permutation_error': str(error)}
+          return {'clusters': clusters, 'bootstrap': bootstrap_result, 'permutation': permutation_result}
+
+     return run
+
+
+def large_file_note(title, reason):
+     with st.expander(title):
+          st.caption(reason + " Turn off large file mode to use it.")
+
+
+def resampling_inference(key, load_data, event_date_name, metric_name, groups_name, intervention_date_name, columns, key_suffix):
+     with st.expander("Bootstrap and permutation inference"):
+          st.caption("The regression table assumes independent errors. For panels where consecutive dates or rows of the same unit are correlated, resample whole blocks of dates or whole units instead.")
+          cluster_name = st.selectbox("Resample by", [None] + list(columns), key='cluster_name_' + key_suffix,
+                                      format_func=lambda column: 'Blocks of consecutive dates' if column is None else 'Units: ' + str(column))
+          block_length = st.number_input("Dates per block", min_value=1, value=1, key='block_length_' + key_suffix, disabled=cluster_name is not None)
+          replicates = st.number_input("Replicates", min_value=100, max_value=100_000, value=DEFAULT_REPLICATES, step=1_000, key='replicates_' + key_suffix)
+          resampling_key = key + ('resampling', event_date_name, metric_name, groups_name, intervention_date_name, cluster_name, int(block_length), int(replicates))
+          if st.button("Run bootstrap and permutation test", key='run_resampling_' + key_suffix):
+               # load_data only has to provide the analysis columns and the resampling unit
+               resampling_columns = list(dict.fromkeys([event_date_name, metric_name, groups_name, intervention_date_name] + ([cluster_name] if cluster_name else [])))
+               resampling_job = job_manager.submit(resampling_job_function(resampling_key, lambda: load_data(resampling_columns), event_date_name, metric_name, groups_name, intervention_date_name,
+                                                                           cluster_name, int(block_length), int(replicates)),
+                                                   name='Resampling', key=resampling_key)
+               st.session_state['resampling_job_' + key_suffix] = resampling_job.id
+          resampling_job = job_manager.get(st.session_state.get('resampling_job_' + key_suffix))
+          if resampling_job is None or resampling_job.key != resampling_key:
+               return
+          if resampling_job.status == "failed":
+               st.write("The resampling failed:", resampling_job.error)
+               return
+          if resampling_job.status == "cancelled":
+               st.write("The resampling was cancelled.")
+               return
+          if resampling_job.status != "done":
+               job_status(resampling_job.id)
+               return
+
+          clusters, bootstrap_result, permutation_result = (resampling_job.result[name] for name in ('clusters', 'bootstrap', 'permutation'))
+          if permutation_result is None:
+               st.caption("Permutation test skipped: " + resampling_job.result['permutation_error'])
+          st.write('Resampled clusters: ', clusters.n_clusters)
+          st.table({'statistic': ['Diff-in-Diff estimate', 'bootstrap standard error', '95% bootstrap CI', 'permutation p-value'],
+                    'value': [str(round(bootstrap_result.estimate, 4)), str(round(bootstrap_result.std_err, 4)),
+                              '[' + str(round(bootstrap_result.ci_low, 4)) + ', ' + str(round(bootstrap_result.ci_high, 4)) + ']',
+                              '-' if permutation_result is None else str(round(permutation_result.p_value, 4))]})
+
+
 # -----------------------------------------------------------------------------
 # Draw the actual page
 
@@ -45,8 +361,12 @@ with tab_sample_data:
      sample_data_examples = st.selectbox(
                "Select the data example",
                (list_examples), index=0, key='sample_data_examples')
-     dataframe = pd.read_csv(sample_data_examples + csv_file_format)
-     data_as_csv= dataframe.to_csv(index=False).encode("utf-8")
+     sample_path = sample_data_examples + csv_file_format
+     sample_hash = result_cache.get_or_compute(('content_hash', sample_path, os.path.getmtime(sample_path)), lambda: content_hash(sample_path))
+     # Memory-mapped Feather copy of the sample after the first read
+     dataframe = result_cache.get_or_compute((sample_hash, 'frame'), lambda: read_sample(sample_path))
+     # The sample file itself is offered for download, no need to re-encode it
+     data_as_csv = result_cache.get_or_compute((sample_hash, 'csv'), lambda: pathlib.Path(sample_path).read_bytes())
 
 
      st.download_button(
@@ -81,110 +401,24 @@ with tab_sample_data:
                "Select your intervention date column",
                (list(dataframe.columns)), index=3, key='intervention_date_name_sample_data')
           
-          model_string = str(metric_name) + '~' + str(groups_name) + '*' +  str(intervention_date_name)
-          target_group_before_string = str(groups_name) + '==1' + ' & '  + str(intervention_date_name) + '==0'
-          target_group_after_string = str(groups_name) + '==1' + ' & '  + str(intervention_date_name) + '==1'
-          control_group_intervention_before_string = str(groups_name) + '==0' + ' & '  + str(intervention_date_name) + '==0'
-          control_group_intervention_after_string = str(groups_name) + '==0' + ' & '  + str(intervention_date_name) + '==1'
      st.latex(r'''Y_dt  = β_0 + β_1 TREAT_d + β_2 POST_t + β_3 TREAT_d*POST_t + e_dt  ''')
 
      st.caption("You will run a lineal regression model based on the one above:")
      st.caption("Treat variable: This will be your groups column")
      st.caption("Post variable: This will be your intervention column")
      st.caption("Treat*Post variable: This will be the combined effect of the group and intervention column")
+     chart_settings = chart_settings_input('sample_data')
+     trace_allocations = trace_allocations_input('sample_data')
      if st.button("Run the sample analysis", key='run_analysis_sample_data'):
-                    target_group_before = dataframe.query(target_group_before_string)[metric_name].mean()
-
-                    target_group_after = dataframe.query(target_group_after_string)[metric_name].mean()
-                    target_group_diff = target_group_after - target_group_before
-
-
-
-                    control_group_intervention_after = dataframe.query(control_group_intervention_after_string)[metric_name].mean()
-                    #target_group_after - control_group_intervention_after
-
-
-                    control_group_intervention_before = dataframe.query(control_group_intervention_before_string)[metric_name].mean()
-
-                    diff_in_diff = (target_group_after-target_group_before)-(control_group_intervention_after-control_group_intervention_before)
-                    sample_summary_data_table = {'event_data': ['before intervention', 'after intervention', 'variation (%)'],
-                                    'control_data': [control_group_intervention_before, control_group_intervention_after, ((control_group_intervention_after-control_group_intervention_before)/control_group_intervention_before)*100],
-                                        'target_data': [target_group_before, target_group_after, ((target_group_after-target_group_before)/target_group_before)*100],
-                                        'counterfactual_data': [target_group_before, target_group_before+(control_group_intervention_after-control_group_intervention_before), (((target_group_before+(control_group_intervention_after-control_group_intervention_before))-target_group_before) / target_group_before)*100]}
-                    summary_data = {'event_data': ['before intervention', 'after intervention'],
-                                    'control_data': [control_group_intervention_before, control_group_intervention_after],
-                                        'target_data': [target_group_before, target_group_after],
-                                        'counterfactual_data': [target_group_before, target_group_before+(control_group_intervention_after-control_group_intervention_before)]}
-                    df_summary_data = pd.DataFrame(data=summary_data)
-                    table_results = smf.ols(model_string, data=dataframe).fit().summary().tables[1]
-
-                    tab_actual_data_sample_data, tab_diff_data_sample_data, tab_regression_sample_data = st.tabs(["Current Data", "Diff-in-Diff Analysis","Regression Model / Explanation"])
-
-                    with tab_actual_data_sample_data:
-
-                         fig = px.line(dataframe, x=event_date_name, y=metric_name, color=groups_name)
-
-                         
-
-                         st.plotly_chart(fig, theme="streamlit")
-                    with tab_diff_data_sample_data:
-                    
-                         x = list(df_summary_data['event_data'])
-                         fig = go.Figure()
-                         fig.add_trace(go.Scatter(
-                         x=x,
-                         y=list(df_summary_data['control_data']),
-                         name = 'Control group', # Style name/legend entry with html tags
-                         connectgaps=False # override default to connect the gaps
-               ))
-                         fig.add_trace(go.Scatter(
-                         x=x,
-                         y=list(df_summary_data['target_data']),
-                         name='Target group',
-               ))
-                         fig.add_trace(go.Scatter(
-                         x=x,
-                         y=[df_summary_data['target_data'][0], df_summary_data['target_data'][0]+(control_group_intervention_after-control_group_intervention_before)],
-                         name='Counterfactual',
-               ))
-
-                         st.plotly_chart(fig, theme="streamlit")
-                         st.table(sample_summary_data_table)
-                         st.markdown('**Control group**')
-                         st.caption("This is the group with no intervention at all, you will use it as for comparing with the target group which will receive the intervention / change planned.")
-                         st.markdown('**Target group**')
-                         st.caption("This is the group which will get the intervention / change planned, you will use it as for comparing with the control group and check how the metrics change over time.")
-                         st.markdown('**Counterfactual group**')
-                         st.caption("This is a group similar to the target group in a scenario when the intervention doesn’t happen at all, the variation will be similar to the control group.")
-
-
-                    with tab_regression_sample_data:
-                         p_value_list = list([table_results[1][4], table_results[2][4],table_results[3][4], table_results[4][4]])
-                         #results_variables = np.where(table_results[4][0:4] >= 0.05, 'is not statistically significant', 'is statistically significant')
-                         st.table(table_results)
-                         list_variables = list([str(table_results[1][0]), str(table_results[2][0]), str(table_results[3][0]), str(table_results[4][0])])
-                         
-                    
-                         st.write(table_results[1][0], ': This is the metric of your control group before the intervention. The base value is', table_results[1][1])
-                         st.write('The standard error for the intercept is ', table_results[1][2], ' which means the estimated value could vary by approximately ',  table_results[1][2] , ' units from the base value.')
-                         st.write('The p-value is ', p_value_list[0], '. The closer to 0, the higher the metric.')
-                         st.write('We are 95 per cent confident that the true value of the control group metric falls between ', table_results[1][5], ' and ',  table_results[1][6])
-
-                         
-                         st.write(table_results[2][0], ': The value is the difference between the control group (', round(sample_summary_data_table['control_data'][0], 2) , ') and the target group metric (', round(sample_summary_data_table['target_data'][0], 2), ') . The value is ', table_results[2][1])
-                         st.write('The standard error is ', table_results[2][2], ' which means the estimated value could vary by approximately ',  table_results[2][2] , ' units from the base value.')
-                         st.write('The p-value is ', p_value_list[1], '. The closer to 0, the higher the metric')
-                         st.write('We are 95 per cent confident that the true ', table_results[2][0],  ' value falls between ', table_results[2][5], ' and ',  table_results[2][6])
-
-                         st.write(table_results[3][0], ': This is the value of the intervention effect or the difference between the metric before (', round(sample_summary_data_table['control_data'][0], 2),') and after the intervention (', round(sample_summary_data_table['control_data'][1], 2),') in the control group. The value is ', table_results[3][1])
-                         st.write('The standard error is ',  table_results[3][2], ' which means the estimated value could vary by approximately ',  table_results[3][2], ' units from the base value.')
-                         st.write('The p-value is ', p_value_list[2], '. The closer to 0, the higher the base value.')
-                         st.write('We are 95 per cent confident that the true ', table_results[3][0], 'value falls between ', table_results[3][5], ' and ',  table_results[3][6])
-
-                         st.write(table_results[4][0], ': The value is the difference between the counterfactual group (', round(sample_summary_data_table['counterfactual_data'][1], 2), ') and the target group (', round(sample_summary_data_table['target_data'][1], 2), ') after the intervention. The value is ', table_results[4][1])
-                         st.write('The standard error is ', table_results[4][2], ' which means the estimated value could vary by approximately ',  table_results[4][2] , ' units from the base value.')
-                         st.write('The p-value is ', p_value_list[3], '. The closer to 0, the higher the base value.')
-                         st.write('We are 95 per cent confident that the true ', table_results[4][0],' value falls between ', table_results[4][5], ' and ',  table_results[4][6])
+          profiler = Profiler('sample analysis', {'file': os.path.basename(sample_path), 'hash': sample_hash},
+                              trace_allocations=trace_allocations)
+          results = cached_diff_in_diff_results((sample_hash,), lambda: CellStats.from_frame(dataframe, metric_name, groups_name, intervention_date_name),
+                                                dataframe, event_date_name, metric_name, groups_name, intervention_date_name, chart_settings, profiler)
+          with profiler.stage('render', rows=len(dataframe)):
+               run_diff_in_diff_analysis(results)
+          performance_panel([profiler], 'sample_data')
+     intervention_date_sensitivity((sample_hash,), lambda: dataframe, event_date_name, metric_name, groups_name, intervention_date_name, 'sample_data')
+     resampling_inference((sample_hash,), lambda resampling_columns: dataframe, event_date_name, metric_name, groups_name, intervention_date_name, dataframe.columns, 'sample_data')
 
 
 
@@ -200,7 +434,7 @@ with tab_sample_data:
 
 
           st.markdown('**How to use the app?**')
-          st.caption('1. Upload a file (CSV files only*)')
+          st.caption('1. Upload a file (CSV, Parquet, Feather or Arrow)')
           st.caption('2. Choose the columns you want for the analysis')
           st.caption('3. Run the analysis and get the insights')
 
@@ -223,17 +457,30 @@ with tab_sample_data:
      )
 
 
-          uploaded_file = st.file_uploader("Upload a file (CSV files only*)")
+          uploaded_file = st.file_uploader("Upload a file (CSV, Parquet, Feather or Arrow)", type=["csv", "parquet", "pq", "feather", "arrow", "ipc"])
+          large_file_mode = st.toggle("Large file mode (CSV)", key='large_file_mode_own_analysis', help="Reads the file in chunks and keeps only the selected columns, so files larger than memory can be analysed. Only the first rows are previewed.")
+          if large_file_mode:
+               use_float32 = st.checkbox("Store the metric as float32 (less memory, ~7 significant digits)", key='use_float32_own_analysis')
           if uploaded_file is not None:
 
           # Can be used wherever a "file-like" object is accepted:
-               dataframe = pd.read_csv(uploaded_file)
+               uploaded_file_format = file_format(uploaded_file.name)
+               upload_hash = uploaded_file_hash(uploaded_file)
+               # Columnar files are previewed here and only the selected columns are read on run
+               preview_only = large_file_mode or uploaded_file_format != "csv"
+               large_csv = large_file_mode and uploaded_file_format == "csv"
+               if preview_only:
+                    dataframe = result_cache.get_or_compute((upload_hash, 'preview'), lambda: read_preview(uploaded_file, fmt=uploaded_file_format))
+               else:
+                    dataframe = result_cache.get_or_compute((upload_hash, 'frame'), lambda: pd.read_csv(uploaded_file))
 
                #if dataframe:
                
                col1, col2 = st.columns(2)
                with col1:
                     st.write("Take a look of your data")
+                    if preview_only:
+                         st.caption('Showing the first ' + str(len(dataframe)) + ' rows')
                     st.write(dataframe)
 
 
@@ -254,100 +501,149 @@ with tab_sample_data:
                (list(dataframe.columns)), key='intervention_date_name_own_analysis', index=3)
                st.latex(r'''Y_dt  = β_0 + β_1 TREAT_d + β_2 POST_t + β_3 TREAT_d*POST_t + e_dt  ''')
                st.write("You will run this model based on the one above:", str(metric_name) + '~' + str(groups_name) + '*' +  str(intervention_date_name) )
-               model_string = str(metric_name) + '~' + str(groups_name) + '*' +  str(intervention_date_name)
-               target_group_before_string = str(groups_name) + '==1' + ' & '  + str(intervention_date_name) + '==0'
-               target_group_after_string = str(groups_name) + '==1' + ' & '  + str(intervention_date_name) + '==1'
-               control_group_intervention_before_string = str(groups_name) + '==0' + ' & '  + str(intervention_date_name) + '==0'
-               control_group_intervention_after_string = str(groups_name) + '==0' + ' & '  + str(intervention_date_name) + '==1'
+               chart_settings = chart_settings_input('own_analysis')
+               trace_allocations = trace_allocations_input('own_analysis')
+               column_mapping = [event_date_name, metric_name, groups_name, intervention_date_name]
+               metric_dtype = ("float32" if use_float32 else "float64") if large_file_mode and uploaded_file_format == "csv" else None
+               analysis_job_key = ('diff_in_diff', upload_hash, metric_dtype, trace_allocations) + tuple(column_mapping) + tuple(chart_settings.values())
                if st.button("Run analysis", key='run_analysis_own_analysis'):
-                    target_group_before = dataframe.query(target_group_before_string)[metric_name].mean()
-
-                    target_group_after = dataframe.query(target_group_after_string)[metric_name].mean()
-                    target_group_diff = target_group_after - target_group_before
-
-
-
-                    control_group_intervention_after = dataframe.query(control_group_intervention_after_string)[metric_name].mean()
-                    #target_group_after - control_group_intervention_after
-
-
-                    control_group_intervention_before = dataframe.query(control_group_intervention_before_string)[metric_name].mean()
-
-                    diff_in_diff = (target_group_after-target_group_before)-(control_group_intervention_after-control_group_intervention_before)
-                    sample_summary_data_table = {'event_data': ['before intervention', 'after intervention', 'variation (%)'],
-                                    'control_data': [control_group_intervention_before, control_group_intervention_after, ((control_group_intervention_after-control_group_intervention_before)/control_group_intervention_before)*100],
-                                        'target_data': [target_group_before, target_group_after, ((target_group_after-target_group_before)/target_group_before)*100],
-                                        'counterfactual_data': [target_group_before, target_group_before+(control_group_intervention_after-control_group_intervention_before), (((target_group_before+(control_group_intervention_after-control_group_intervention_before))-target_group_before) / target_group_before)*100]}
-                    summary_data = {'event_data': ['before intervention', 'after intervention'],
-                                    'control_data': [control_group_intervention_before, control_group_intervention_after],
-                                        'target_data': [target_group_before, target_group_after],
-                                        'counterfactual_data': [target_group_before, target_group_before+(control_group_intervention_after-control_group_intervention_before)]}
-                    df_summary_data = pd.DataFrame(data=sample_summary_data_table)
-                    table_results = smf.ols(model_string, data=dataframe).fit().summary().tables[1]
-
-                    tab1, tab2, tab3 = st.tabs(["Current Data", "Diff-in-Diff Analysis","Regression Model / Explanation"])
-
-                    with tab1:
-
-                         fig = px.line(dataframe, x=event_date_name, y=metric_name, color=groups_name)
-                         st.plotly_chart(fig, theme="streamlit")
-                    with tab2:
-                    
-                         x = list(df_summary_data['event_data'][0:2])
-                         fig = go.Figure()
-                         fig.add_trace(go.Scatter(
-                         x=x,
-                         y=list(df_summary_data['control_data'][0:2]),
-                         name = 'Control group', # Style name/legend entry with html tags
-                         connectgaps=False # override default to connect the gaps
-               ))
-                         fig.add_trace(go.Scatter(
-                         x=x,
-                         y=list(df_summary_data['target_data'][0:2]),
-                         name='Target group',
-               ))
-                         fig.add_trace(go.Scatter(
-                         x=x,
-                         y=[df_summary_data['target_data'][0], df_summary_data['target_data'][0]+(control_group_intervention_after-control_group_intervention_before)],
-                         name='Counterfactual',
-               ))
-
-                         st.plotly_chart(fig, theme="streamlit")
-                         st.table(df_summary_data)
-                         st.markdown('**Control group**')
-                         st.caption("This is the group with no intervention at all, you will use it as for comparing with the target group which will receive the intervention / change planned.")
-                         st.markdown('**Target group**')
-                         st.caption("This is the group which will get the intervention / change planned, you will use it as for comparing with the control group and check how the metrics change over time.")
-                         st.markdown('**Counterfactual group**')
-                         st.caption("This is a group similar to the target group in a scenario when the intervention doesn’t happen at all, the variation will be similar to the control group.")
-
-
-                    with tab3:
-                         p_value_list = list([table_results[1][4], table_results[2][4],table_results[3][4], table_results[4][4]])
-                         #results_variables = np.where(table_results[4][0:4] >= 0.05, 'is not statistically significant', 'is statistically significant')
-                         st.table(table_results)
-                         list_variables = list([str(table_results[1][0]), str(table_results[2][0]), str(table_results[3][0]), str(table_results[4][0])])
-                         
-                         st.write(table_results[1][0], ': This is the metric of your control group before the intervention. The base value is', table_results[1][1])
-                         st.write('The standard error for the intercept is ', table_results[1][2], ' which means the estimated value could vary by approximately ',  table_results[1][2] , ' units from the base value.')
-                         st.write('The p-value is ', p_value_list[0], '. The closer to 0, the higher the metric.')
-                         st.write('We are 95 per cent confident that the true value of the control group metric falls between ', table_results[1][5], ' and ',  table_results[1][6])
-
-                         
-                         st.write(table_results[2][0], ': The value is the difference between the control group (', round(sample_summary_data_table['control_data'][0], 2) , ') and the target group metric (', round(sample_summary_data_table['target_data'][0], 2), ') . The value is ', table_results[2][1])
-                         st.write('The standard error is ', table_results[2][2], ' which means the estimated value could vary by approximately ',  table_results[2][2] , ' units from the base value.')
-                         st.write('The p-value is ', p_value_list[1], '. The closer to 0, the higher the metric')
-                         st.write('We are 95 per cent confident that the true ', table_results[2][0],  ' value falls between ', table_results[2][5], ' and ',  table_results[2][6])
-
-                         st.write(table_results[3][0], ': This is the value of the intervention effect or the difference between the metric before (', round(sample_summary_data_table['control_data'][0], 2),') and after the intervention (', round(sample_summary_data_table['control_data'][1], 2),') in the control group. The value is ', table_results[3][1])
-                         st.write('The standard error is ',  table_results[3][2], ' which means the estimated value could vary by approximately ',  table_results[3][2], ' units from the base value.')
-                         st.write('The p-value is ', p_value_list[2], '. The closer to 0, the higher the base value.')
-                         st.write('We are 95 per cent confident that the true ', table_results[3][0], 'value falls between ', table_results[3][5], ' and ',  table_results[3][6])
-
-                         st.write(table_results[4][0], ': The value is the difference between the counterfactual group (', round(sample_summary_data_table['counterfactual_data'][1], 2), ') and the target group (', round(sample_summary_data_table['target_data'][1], 2), ') after the intervention. The value is ', table_results[4][1])
-                         st.write('The standard error is ', table_results[4][2], ' which means the estimated value could vary by approximately ',  table_results[4][2] , ' units from the base value.')
-                         st.write('The p-value is ', p_value_list[3], '. The closer to 0, the higher the base value.')
-                         st.write('We are 95 per cent confident that the true ', table_results[4][0],' value falls between ', table_results[4][5], ' and ',  table_results[4][6])
+                    profiler = Profiler('analysis', {'file': uploaded_file.name, 'hash': upload_hash, 'columns': column_mapping},
+                                        trace_allocations=trace_allocations)
+                    analysis_job = job_manager.submit(diff_in_diff_job(uploaded_file.getbuffer(), upload_hash, uploaded_file_format, None if preview_only else dataframe,
+                                                                       metric_dtype, column_mapping, chart_settings, profiler),
+                                                      name=uploaded_file.name, key=analysis_job_key)
+                    st.session_state['analysis_job_own_analysis'] = analysis_job.id
+               # The last job of this session is shown until the columns or chart options change
+               analysis_job = job_manager.get(st.session_state.get('analysis_job_own_analysis'))
+               if analysis_job is not None and analysis_job.key == analysis_job_key:
+                    if analysis_job.status == "done":
+                         if 'caption' in analysis_job.result:
+                              st.caption(analysis_job.result['caption'])
+                         # Sending the tables and figures to the browser happens on every rerun
+                         render_profiler = Profiler('render', analysis_job.result['profiler'].context)
+                         with render_profiler.stage('render'):
+                              run_diff_in_diff_analysis(analysis_job.result)
+                         performance_panel([analysis_job.result['profiler'], render_profiler], 'own_analysis')
+                    elif analysis_job.status == "failed":
+                         st.write("The analysis failed:", analysis_job.error)
+                    elif analysis_job.status == "cancelled":
+                         st.write("The analysis was cancelled.")
+                    else:
+                         job_status(analysis_job.id)
+
+               sweep_columns = list(dict.fromkeys([event_date_name, metric_name, groups_name, intervention_date_name]))
+               intervention_date_sensitivity((upload_hash,), lambda: read_columns(uploaded_file, sweep_columns, fmt=uploaded_file_format) if preview_only else dataframe,
+                                             event_date_name, metric_name, groups_name, intervention_date_name, 'own_analysis', large_csv=uploaded_file if large_csv else None)
+               # The analyses below need every row of their columns in memory, which large file mode is there to avoid
+               if large_csv:
+                    large_file_note("Bootstrap and permutation inference", "Resampling needs the rows of every date block or unit in memory.")
+               else:
+                    # The job reads the upload through its own view, as the analysis job does
+                    upload_buffer = uploaded_file.getbuffer()
+                    resampling_inference((upload_hash,), lambda resampling_columns: read_columns(BufferFile(upload_buffer), resampling_columns, fmt=uploaded_file_format) if preview_only else dataframe,
+                                         event_date_name, metric_name, groups_name, intervention_date_name, dataframe.columns, 'own_analysis')
+
+               if large_csv:
+                    large_file_note("Staggered adoption / event study", "The event study builds a unit x period panel from every row.")
+               else:
+                    with st.expander("Staggered adoption / event study"):
+                         st.caption("When units (markets, stores...) adopt the intervention at different dates, the single 2x2 regression is biased. This estimates the effect for every adoption cohort and period (Callaway & Sant'Anna, 2021) and averages them by periods since adoption.")
+                         unit_name = st.selectbox("Select your unit column", list(dataframe.columns), key='unit_name_own_analysis')
+                         treated_name = st.selectbox("Select your treated column (1 from the adoption date onwards)", list(dataframe.columns),
+                                                     index=list(dataframe.columns).index(intervention_date_name), key='treated_name_own_analysis')
+                         control_group = st.radio("Compare with", CONTROL_GROUPS, horizontal=True, key='control_group_own_analysis',
+                                                  format_func=lambda group: {"never_treated": "Never treated units", "not_yet_treated": "Not yet treated units"}[group])
+                         if st.toggle("Run the event study", key='run_event_study_own_analysis'):
+                              event_study_columns = list(dict.fromkeys([unit_name, event_date_name, metric_name, treated_name]))
+                              try:
+                                   event_study_result = result_cache.get_or_compute((upload_hash, 'event_study', unit_name, event_date_name, metric_name, treated_name, control_group),
+                                                                                    lambda: event_study(read_columns(uploaded_file, event_study_columns, fmt=uploaded_file_format) if preview_only else dataframe,
+                                                                                                        unit_name, event_date_name, metric_name, treated_name, control_group))
+                              except ValueError as error:
+                                   st.write(str(error))
+                              else:
+                                   st.write(event_study_result.n_units, 'units in the balanced panel.', event_study_result.dropped_units, 'units left out because they miss some periods.')
+                                   st.plotly_chart(build_event_study_figure(event_study_result.dynamic), theme="streamlit")
+                                   st.markdown('**Effect by periods since adoption**')
+                                   st.dataframe(event_study_result.dynamic, hide_index=True)
+                                   st.markdown('**Effect by adoption cohort and period**')
+                                   st.dataframe(event_study_result.group_time, hide_index=True)
+
+               if large_csv:
+                    large_file_note("Batch analysis: several metrics and segments", "The batch analysis reads every selected metric and segment column in full.")
+               else:
+                    with st.expander("Batch analysis: several metrics and segments"):
+                         st.caption("Runs the same groups / intervention design for every selected metric and, optionally, for every value of a segment column (country, platform...).")
+                         batch_metric_names = st.multiselect("Select your metric columns", list(dataframe.columns), default=[metric_name], key='batch_metric_names_own_analysis')
+                         batch_segment_name = st.selectbox("Select your segment column (optional)", [None] + list(dataframe.columns), key='batch_segment_name_own_analysis',
+                                                           format_func=lambda column: 'No segments' if column is None else column)
+                         batch_correction = st.selectbox("Multiple-testing correction", CORRECTIONS, key='batch_correction_own_analysis',
+                                                         format_func=lambda method: {"holm": "Holm", "bonferroni": "Bonferroni", "fdr_bh": "Benjamini-Hochberg (FDR)", "none": "None"}[method])
+                         if st.button("Run batch analysis", key='run_batch_analysis_own_analysis', disabled=not batch_metric_names):
+                              batch_columns = list(dict.fromkeys([groups_name, intervention_date_name] + batch_metric_names + ([batch_segment_name] if batch_segment_name else [])))
+
+                              def run_batch_analysis():
+                                   batch_data = read_columns(uploaded_file, batch_columns, fmt=uploaded_file_format) if preview_only else dataframe
+                                   return batch_diff_in_diff(batch_data, batch_metric_names, groups_name, intervention_date_name, batch_segment_name,
+                                                             correction=batch_correction, max_workers=os.cpu_count())
+
+                              batch_results = result_cache.get_or_compute((upload_hash, 'batch', groups_name, intervention_date_name, tuple(batch_metric_names), batch_segment_name, batch_correction),
+                                                                          run_batch_analysis)
+                              st.dataframe(batch_results, hide_index=True)
+                              st.download_button(
+                              label="Download batch results",
+                              data=batch_results.to_csv(index=False).encode("utf-8"),
+                              file_name="diff-in-diff-batch-results.csv",
+                              mime="text/csv",
+                              key='download_batch_results_own_analysis'
+                              )
+
+               if large_csv:
+                    large_file_note("Incremental analysis: append new rows to a saved analysis", "Appending fingerprints every row of the file.")
+               else:
+                    with st.expander("Incremental analysis: append new rows to a saved analysis"):
+                         st.caption("Keeps the per date and group totals of an analysis on disk, so you only upload the rows added since last time. Rows that were already appended are detected and skipped.")
+                         store_dir = os.environ.get("DID_STORE_DIR", DEFAULT_STORE_DIR)
+                         saved_analyses = list_analyses(store_dir)
+                         if 'created_analysis_own_analysis' in st.session_state:
+                              # Select the analysis created on the previous run before the selectbox is drawn
+                              st.session_state['analysis_name_own_analysis'] = st.session_state.pop('created_analysis_own_analysis')
+                         analysis_name = st.selectbox("Select a saved analysis", [None] + saved_analyses, key='analysis_name_own_analysis',
+                                                      format_func=lambda name: 'New analysis with the selected columns' if name is None else name)
+                         if analysis_name is None:
+                              new_analysis_name = st.text_input("Name of the new analysis", key='new_analysis_name_own_analysis')
+                              row_key_name = st.selectbox("Column that identifies a row (e.g. an event id)", [None] + list(dataframe.columns), key='row_key_own_analysis',
+                                                          format_func=lambda name: 'All columns of the first file' if name is None else name,
+                                                          help="Used to recognise rows that were already appended. Rows with the same values in this column are treated as the same row.")
+                         else:
+                              analysis = IncrementalAnalysis.open(store_dir, analysis_name)
+                              st.write('Columns:', ', '.join(analysis.column_mapping), '-', analysis.meta['nrows'], 'rows appended so far.')
+                              if analysis.row_columns is not None:
+                                   st.write('Rows are identified by:', ', '.join(analysis.row_columns))
+                         if st.button("Append this file", key='append_file_own_analysis', disabled=analysis_name is None and not new_analysis_name):
+                              try:
+                                   if analysis_name is None:
+                                        analysis = IncrementalAnalysis.create(store_dir, new_analysis_name, event_date_name, metric_name, groups_name, intervention_date_name,
+                                                                              row_key=row_key_name)
+                                   append_columns = None if analysis.row_columns is None else list(dict.fromkeys(analysis.column_mapping + analysis.row_columns))
+                                   append_report = analysis.append(read_columns(uploaded_file, append_columns, fmt=uploaded_file_format) if preview_only else dataframe)
+                              except (KeyError, ValueError, OSError) as error:
+                                   st.write("The file could not be appended:", str(error))
+                              else:
+                                   st.write(append_report.new_rows, 'new rows appended,', append_report.duplicate_rows, 'rows already in the analysis skipped,',
+                                            append_report.skipped_rows, 'rows with missing or non 0/1 values skipped.')
+                                   if analysis_name is None:
+                                        st.session_state['created_analysis_own_analysis'] = new_analysis_name
+                                        st.rerun()
+                         if analysis_name is not None and analysis.meta['nrows'] > 0:
+                              run_diff_in_diff_analysis(build_diff_in_diff_results(analysis.cells(), analysis.series(), *analysis.column_mapping, chart_settings))
+
+               with st.expander("Server jobs"):
+                    st.caption("Analyses run in the background on a shared pool of workers (DID_JOB_WORKERS). Use the queue and latency figures to size the server.")
+                    st.table({statistic: ['-' if value is None else str(round(value, 3))] for statistic, value in job_manager.stats().items()})
+                    st.dataframe(pd.DataFrame([{'job': job.id, 'file': job.name, 'status': job.status, 'progress': round(job.progress, 2),
+                                                'queue_seconds': round(job.queue_seconds, 2), 'run_seconds': round(job.run_seconds, 2)}
+                                               for job in job_manager.jobs()]), hide_index=True)
                     
                     
 
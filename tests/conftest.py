@@ -0,0 +1,16 @@
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Every sample CSV has the event date, metric, groups and intervention columns in that order
+SAMPLE_PATHS = sorted(glob.glob(os.path.join(ROOT, "*.csv")))
+
+
+@pytest.fixture(params=SAMPLE_PATHS, ids=lambda path: os.path.basename(path)[:-4])
+def sample(request):
+    """A sample CSV as ``(dataframe, [event_date, metric, groups, intervention])``."""
+    dataframe = pd.read_csv(request.param)
+    return dataframe, list(dataframe.columns[:4])
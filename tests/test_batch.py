@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from did_engine import CellStats, adjust_pvalues, batch_diff_in_diff, fit_cells, synthetic_panel
+
+
+@pytest.fixture
+def segmented_panel():
+    dataframe = synthetic_panel(units=600, periods=10, seed=8)
+    rng = np.random.default_rng(8)
+    dataframe["region"] = np.repeat(rng.choice(["north", "south", "east"], 600), 10)
+    dataframe["revenue"] = dataframe["metric"] * 100 + 1e6
+    dataframe.loc[dataframe.index[::17], "revenue"] = np.nan
+    return dataframe
+
+
+def test_batch_matches_per_segment_fits(segmented_panel):
+    metric_names = ["metric", "revenue"]
+    results = batch_diff_in_diff(segmented_panel, metric_names, "treat", "post", segment_name="region")
+    assert list(results["metric"]) == ["metric"] * 3 + ["revenue"] * 3
+    assert list(results["segment"]) == ["east", "north", "south"] * 2
+    for row in results.itertuples():
+        segment = segmented_panel[segmented_panel["region"] == row.segment]
+        regression = fit_cells(CellStats.from_frame(segment, row.metric, "treat", "post"))
+        assert row.nobs == regression.nobs
+        np.testing.assert_allclose(row.diff_in_diff, regression.diff_in_diff, rtol=1e-9)
+        np.testing.assert_allclose([row.std_err, row.t, row.p_value, row.ci_low, row.ci_high],
+                                   [regression.bse[3], regression.tvalues[3], regression.pvalues[3],
+                                    regression.conf_int_low[3], regression.conf_int_high[3]], rtol=1e-8)
+    np.testing.assert_allclose(results["p_adjusted"], adjust_pvalues(results["p_value"].to_numpy(), "holm"))
+
+
+def test_batch_without_segments_is_the_whole_frame(segmented_panel):
+    results = batch_diff_in_diff(segmented_panel, ["metric"], "treat", "post", correction="none")
+    regression = fit_cells(CellStats.from_frame(segmented_panel, "metric", "treat", "post"))
+    assert len(results) == 1
+    assert results.loc[0, "diff_in_diff"] == pytest.approx(regression.diff_in_diff, rel=1e-12)
+    assert results.loc[0, "std_err"] == pytest.approx(regression.bse[3], rel=1e-12)
+    assert results.loc[0, "p_adjusted"] == results.loc[0, "p_value"]
+
+
+def test_adjust_pvalues():
+    pvalues = np.array([0.01, 0.04, 0.03, 0.2])
+    np.testing.assert_allclose(adjust_pvalues(pvalues, "bonferroni"), [0.04, 0.16, 0.12, 0.8])
+    np.testing.assert_allclose(adjust_pvalues(pvalues, "holm"), [0.04, 0.09, 0.09, 0.2])
+    np.testing.assert_allclose(adjust_pvalues(pvalues, "fdr_bh"), [0.04, 0.04 * 4 / 3, 0.04 * 4 / 3, 0.2])
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from did_engine import ResultCache, content_hash
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert len(cache) == 2
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = ResultCache(ttl=60.0)
+    cache.put("a", np.zeros(10))
+    now[0] += 59.0
+    assert cache.get("a") is not None
+    now[0] += 2.0
+    assert cache.get("a") is None
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_size_bound_evicts_until_the_entries_fit():
+    cache = ResultCache(max_bytes=3_000)
+    for key in "abc":
+        cache.put(key, np.zeros(125))  # 1,000 bytes each
+    assert cache.nbytes == 3_000
+    cache.put("d", np.zeros(250))
+    assert [key for key in "abcd" if cache.get(key) is not None] == ["c", "d"]
+    assert cache.nbytes == 3_000
+    # A value larger than the whole cache is not stored
+    cache.put("huge", np.zeros(1_000))
+    assert cache.get("huge") is None and cache.nbytes == 3_000
+
+
+def test_get_or_compute_runs_a_missing_key_once_for_concurrent_callers():
+    cache = ResultCache()
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(threading.get_ident())
+        release.wait(5)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["result"] * 8
+    assert len(calls) == 1
+    assert (cache.misses, cache.hits) == (1, 7)
+
+
+def test_a_failed_computation_is_not_cached():
+    cache = ResultCache()
+
+    def fail():
+        raise ValueError("bad input")
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            cache.get_or_compute("key", fail)
+    assert cache.misses == 2
+    assert cache.get_or_compute("key", lambda: 1) == 1
+
+
+def test_content_hash_is_the_same_for_every_source(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_bytes(b"a,b\n1,2\n" * 1_000)
+    with open(path, "rb") as file:
+        digests = {content_hash(str(path)), content_hash(path.read_bytes()), content_hash(file)}
+    assert len(digests) == 1
+    assert content_hash(b"a,b\n1,3\n") not in digests
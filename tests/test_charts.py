@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from did_engine.charts import downsample_series, lttb_indices, minmax_indices
+
+
+@pytest.fixture
+def walk():
+    rng = np.random.default_rng(19)
+    y = np.cumsum(rng.normal(size=1_000))
+    y[400] = 100.0
+    return y
+
+
+def test_lttb_keeps_the_budget_the_endpoints_and_spikes(walk):
+    x = np.arange(len(walk)) * 2.0
+    index = lttb_indices(x, walk, 50)
+    assert len(index) == 50
+    assert index[0] == 0 and index[-1] == len(walk) - 1
+    assert (np.diff(index) > 0).all()
+    assert 400 in index
+    np.testing.assert_array_equal(lttb_indices(x, walk, len(walk)), np.arange(len(walk)))
+    # Buckets of only missing values give one missing point, the others none
+    walk[100:160] = np.nan
+    index = lttb_indices(x, walk, 50)
+    assert len(index) == 50 and 400 in index
+    edges = np.linspace(0, len(walk) - 2, 48 + 1).astype(int) + 1
+    all_missing = [np.isnan(walk[start:stop]).all() for start, stop in zip(edges[:-1], edges[1:])]
+    assert np.isnan(walk[index]).sum() == sum(all_missing) > 0
+
+
+def test_minmax_keeps_the_budget_the_endpoints_and_extremes(walk):
+    for n_out in (4, 5, 50, 51):
+        index = minmax_indices(walk, n_out)
+        assert len(index) <= n_out
+        assert index[0] == 0 and index[-1] == len(walk) - 1
+    index = minmax_indices(walk, 50)
+    edges = np.linspace(0, len(walk), 24 + 1).astype(int)
+    for start, stop in zip(edges[:-1], edges[1:]):
+        assert start + np.argmin(walk[start:stop]) in index and start + np.argmax(walk[start:stop]) in index
+    # Missing values are ignored, and a bucket of only missing values contributes nothing
+    walk[:] = np.linspace(0, 1, len(walk))
+    walk[0:500] = np.nan
+    index = minmax_indices(walk, 6)
+    assert index.tolist() == [0, 500, 999]
+
+
+def test_downsample_series_per_group_budget():
+    dates = pd.date_range("2020-01-01", periods=3_000, freq="D")
+    series = pd.DataFrame({"date": np.tile(dates, 3), "metric": np.random.default_rng(20).normal(size=9_000), "group": np.repeat([0, 1, 2], 3_000)})
+    for method in ("lttb", "minmax"):
+        downsampled = downsample_series(series, "date", "metric", "group", max_points=300, method=method)
+        assert len(downsampled) <= 300
+        for _, group in downsampled.groupby("group"):
+            assert group["date"].iloc[0] == dates[0] and group["date"].iloc[-1] == dates[-1]
+            assert group["date"].is_monotonic_increasing
+    assert downsample_series(series, "date", "metric", "group", max_points=10_000) is series
+    with pytest.raises(ValueError):
+        downsample_series(series, "date", "metric", "group", max_points=300, method="every_tenth")
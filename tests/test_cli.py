@@ -0,0 +1,98 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from did_engine import CellStats, fit_cells, synthetic_panel
+from did_engine.cli import main
+from did_engine.runner import JobSpec, jobs_from_directory, load_manifest
+
+COLUMNS = ["event_date", "metric", "treat", "post"]
+FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather", "stream": ".arrow"}
+
+
+def write_panel(path, dataframe, fmt):
+    if fmt == "csv":
+        dataframe.to_csv(path, index=False)
+    elif fmt == "parquet":
+        dataframe.to_parquet(path, index=False)
+    elif fmt == "feather":
+        dataframe.to_feather(path)
+    else:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(dataframe, preserve_index=False)
+        with pa.ipc.new_stream(str(path), table.schema) as writer:
+            writer.write_table(table)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    pytest.importorskip("pyarrow")
+    directory = tmp_path / "data"
+    directory.mkdir()
+    panels = {}
+    for seed, (fmt, suffix) in enumerate(FORMATS.items()):
+        panels[fmt] = synthetic_panel(units=40, periods=6, seed=30 + seed)
+        write_panel(directory / (fmt + suffix), panels[fmt], fmt)
+    (directory / "notes.txt").write_text("not data")
+    return directory, panels
+
+
+def test_load_manifest(tmp_path):
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text(json.dumps({
+        "defaults": {"event_date_name": "event_date", "groups_name": "treat", "intervention_date_name": "post"},
+        "jobs": [{"path": "data/a.csv", "metric_name": "metric"},
+                 {"path": "b.parquet", "metric_name": "sales", "groups_name": "market", "name": "sales"}],
+    }))
+    assert load_manifest(str(manifest)) == [
+        JobSpec(str(tmp_path / "data" / "a.csv"), "event_date", "metric", "treat", "post", "a"),
+        JobSpec(str(tmp_path / "b.parquet"), "event_date", "sales", "market", "post", "sales"),
+    ]
+    manifest.write_text(json.dumps([dict(zip(["path"] + [name + "_name" for name in ("event_date", "metric", "groups", "intervention_date")],
+                                             ["a.csv"] + COLUMNS))]))
+    assert load_manifest(str(manifest)) == [JobSpec(str(tmp_path / "a.csv"), *COLUMNS)]
+    manifest.write_text(json.dumps([{"path": "a.csv", "metric": "metric"}]))
+    with pytest.raises(ValueError, match="unknown job fields in manifest: metric"):
+        load_manifest(str(manifest))
+
+
+def test_jobs_from_directory_takes_supported_files(data_dir):
+    directory, _ = data_dir
+    specs = jobs_from_directory(str(directory), *COLUMNS)
+    assert [spec.name for spec in specs] == sorted(FORMATS)
+    assert all(spec.metric_name == "metric" for spec in specs)
+
+
+@pytest.mark.parametrize("output, workers", [("results.json", "1"), ("results.parquet", "2")])
+def test_cli_runs_every_format(data_dir, tmp_path, capsys, output, workers):
+    directory, panels = data_dir
+    output = tmp_path / output
+    assert main([str(directory), "--event-date", "event_date", "--metric", "metric", "--groups", "treat",
+                 "--intervention", "post", "--output", str(output), "--workers", workers, "--chunksize", "50"]) == 0
+    assert "4 of 4 jobs succeeded" in capsys.readouterr().out
+
+    results = pd.read_parquet(output) if output.suffix == ".parquet" else pd.DataFrame(json.loads(output.read_text()))
+    assert results["name"].tolist() == sorted(FORMATS)
+    for record in results.itertuples():
+        regression = fit_cells(CellStats.from_frame(panels[record.name], "metric", "treat", "post"))
+        assert record.status == "ok" and record.nobs == regression.nobs
+        np.testing.assert_allclose([record.diff_in_diff, record.std_err], [regression.params[3], regression.bse[3]], rtol=1e-9)
+
+
+def test_cli_exit_codes(data_dir, tmp_path, capsys):
+    directory, _ = data_dir
+    output = tmp_path / "results.json"
+    # A job that fails makes the exit code 1, the others still run
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text(json.dumps({"defaults": dict(zip(["event_date_name", "metric_name", "groups_name", "intervention_date_name"], COLUMNS)),
+                                    "jobs": [{"path": "data/csv.csv"}, {"path": "data/parquet.parquet", "metric_name": "missing"}]}))
+    assert main([str(manifest), "--output", str(output), "--workers", "1"]) == 1
+    assert "parquet: " in capsys.readouterr().err
+    assert [record["status"] for record in json.loads(output.read_text())] == ["ok", "error"]
+    # A directory without the column options is a usage error
+    with pytest.raises(SystemExit) as exit_info:
+        main([str(directory), "--output", str(output)])
+    assert exit_info.value.code == 2
@@ -0,0 +1,37 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from did_engine.charts import aggregate_series
+from did_engine.dates import parse_dates, sorted_dates
+from did_engine.store import _canonical_values
+
+
+def test_sorted_dates_orders_numbers_dates_and_text():
+    codes, dates = sorted_dates(pd.Series(["10", "2", None, "1"], dtype=object))
+    assert dates.tolist() == [1, 2, 10] and codes.tolist() == [2, 1, -1, 0]
+    # The same day written two ways is one date
+    codes, dates = sorted_dates(pd.Series(["2024-01-02", "2024-1-1", "2024-01-01"]))
+    assert dates.tolist() == [pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-02")] and codes.tolist() == [1, 0, 0]
+    codes, dates = sorted_dates(pd.Series(["b", "a", "2024-01-01"]))
+    assert dates.tolist() == ["2024-01-01", "a", "b"]
+    codes, dates = sorted_dates(np.array([2001.0, np.nan, 1999.0]))
+    assert dates.tolist() == [1999.0, 2001.0] and codes.tolist() == [1, -1, 0]
+
+
+def test_every_module_reads_dates_alike_without_format_warnings():
+    text = pd.Series(["Jan 2024", "Mar 2024", "Feb 2024", "10 Feb 2024"])
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        parsed = parse_dates(text)
+        series = aggregate_series(pd.DataFrame({"date": text, "metric": [1.0, 2.0, 3.0, 4.0], "treat": 0}), "date", "metric", "treat")
+        canonical = _canonical_values(text)
+        _, dates = sorted_dates(text)
+    assert pd.api.types.is_datetime64_any_dtype(parsed)
+    assert series["date"].tolist() == dates.tolist() == sorted(parsed)
+    assert canonical.tolist() == ["2024-01-01", "2024-03-01", "2024-02-01", "2024-02-10"]
+    # Years as text and as numbers chart, sort and fingerprint alike
+    years = pd.Series(["2001", "1999"])
+    assert parse_dates(years).tolist() == [2001, 1999]
+    assert _canonical_values(years).tolist() == _canonical_values(pd.Series([2001, 1999])).tolist()
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from did_engine import event_study
+
+
+def staggered_panel(units=90, periods=7, seed=13):
+    """Units adopting in periods 2, 3 or 5 or never, with cohort-specific trends and effects."""
+    rng = np.random.default_rng(seed)
+    adoption = rng.choice([2, 3, 5, periods], size=units)
+    period = np.tile(np.arange(periods), units)
+    unit = np.repeat(np.arange(units), periods)
+    treated = (period >= adoption[unit]).astype(int)
+    metric = (rng.normal(0, 1, units)[unit] + 0.3 * adoption[unit] * period
+              + treated * (1 + 0.5 * (period - adoption[unit])) + rng.normal(0, 1, len(unit)))
+    return pd.DataFrame({"unit": unit, "period": period, "metric": metric, "treated": treated}), adoption
+
+
+def pair_units(wide, adoption, cohort, period, control_group):
+    """Change of every unit from period ``cohort - 1`` to ``period``, and the treated and comparison units."""
+    if control_group == "never_treated":
+        compared = adoption == wide.shape[1]
+    else:
+        compared = adoption > max(period, cohort)
+    return wide[:, period] - wide[:, cohort - 1], adoption == cohort, compared
+
+
+def brute_force_att(wide, adoption, cohort, period, control_group):
+    """ATT(g, t) and its standard error, selecting the treated and comparison units from scratch."""
+    change, treated, compared = pair_units(wide, adoption, cohort, period, control_group)
+    treated, control = change[treated], change[compared]
+    att = treated.mean() - control.mean()
+    std_err = np.sqrt(treated.var(ddof=1) / len(treated) + control.var(ddof=1) / len(control))
+    return att, std_err
+
+
+@pytest.mark.parametrize("control_group", ["never_treated", "not_yet_treated"])
+def test_group_time_atts_match_brute_force(control_group):
+    dataframe, adoption = staggered_panel()
+    wide = dataframe.pivot(index="unit", columns="period", values="metric").to_numpy()
+    result = event_study(dataframe, "unit", "period", "metric", "treated", control_group=control_group)
+    assert result.n_units == len(adoption) and result.dropped_units == 0
+    assert len(result.group_time) == 3 * 7
+    for row in result.group_time.itertuples():
+        att, std_err = brute_force_att(wide, adoption, row.cohort, row.period, control_group)
+        np.testing.assert_allclose([row.att, row.std_err], [att, std_err], rtol=1e-9, atol=1e-12)
+        assert row.n_treated == (adoption == row.cohort).sum()
+
+    # Dynamic effects are the cohort-size weighted average of ATT(g, g + e), with the
+    # variance of the summed influence of every unit on the pairs it takes part in
+    group_time = result.group_time.dropna(subset=["att"])
+    influence = np.zeros((len(wide), len(result.dynamic)))
+    for position, event_time in enumerate(result.dynamic["event_time"]):
+        rows = group_time[group_time["event_time"] == event_time]
+        for row, weight in zip(rows.itertuples(), rows["n_treated"] / rows["n_treated"].sum()):
+            change, treated, compared = pair_units(wide, adoption, row.cohort, row.period, control_group)
+            for units, sign in ((treated, 1), (compared, -1)):
+                influence[units, position] += sign * weight * (change[units] - change[units].mean()) / units.sum()
+        np.testing.assert_allclose(result.dynamic["att"][position], np.average(rows["att"], weights=rows["n_treated"]), rtol=1e-9, atol=1e-12)
+    # The estimator applies each cohort's n / (n - 1) to its spread around the cohort mean
+    np.testing.assert_allclose(result.dynamic["std_err"], np.sqrt((influence ** 2).sum(axis=0)), rtol=0.03)
+
+
+def test_without_a_balanced_unit():
+    dataframe, _ = staggered_panel(units=5)
+    with pytest.raises(ValueError, match="no unit is observed in every period"):
+        event_study(dataframe.iloc[::2], "unit", "period", "metric", "treated")
+    with pytest.raises(ValueError, match="no unit is observed in every period"):
+        event_study(dataframe.iloc[:0], "unit", "period", "metric", "treated")
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from did_engine.executor import JobCancelled, JobManager
+
+
+def wait_for(job, timeout=5.0):
+    """Block until ``job`` has finished."""
+    for _ in range(int(timeout / 0.01)):
+        if job.finished:
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job " + job.id + " is still " + job.status)
+
+
+def blocking_job(started, release):
+    """A job that reports progress until ``release`` is set."""
+    def run(job):
+        started.set()
+        while not release.wait(0.01):
+            job.report(0, 1)
+        return "released"
+
+    return run
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(max_workers=1)
+    yield manager
+    manager.shutdown()
+
+
+def test_submitting_a_key_twice_runs_it_once(manager):
+    calls = []
+    first = manager.submit(lambda job: calls.append(job.id) or len(calls), key=("fit", 1))
+    second = manager.submit(lambda job: calls.append(job.id) or len(calls), key=("fit", 1))
+    assert second is first
+    assert wait_for(first).result == 1
+    assert manager.submit(lambda job: 2, key=("fit", 1)) is first
+    assert calls == [first.id]
+    assert manager.stats()["done"] == 1
+
+
+def test_failed_and_cancelled_jobs_are_resubmitted(manager):
+    failed = wait_for(manager.submit(lambda job: 1 / 0, key="fit"))
+    assert failed.status == "failed" and failed.error.startswith("ZeroDivisionError")
+    retried = wait_for(manager.submit(lambda job: "ok", key="fit"))
+    assert retried is not failed and retried.result == "ok"
+
+    def cancelled_inside(job):
+        raise JobCancelled(job.id)
+
+    cancelled = wait_for(manager.submit(cancelled_inside, key="other"))
+    assert cancelled.status == "cancelled"
+    assert wait_for(manager.submit(lambda job: "again", key="other")).result == "again"
+
+
+def test_cancel_queued_and_running_jobs(manager):
+    started, release = threading.Event(), threading.Event()
+    running = manager.submit(blocking_job(started, release))
+    started.wait(5)
+    queued_calls = []
+    queued = manager.submit(lambda job: queued_calls.append(job.id))
+    assert (running.status, queued.status) == ("running", "queued")
+
+    # A queued job is cancelled at once and never starts
+    manager.cancel(queued.id)
+    assert queued.status == "cancelled"
+    # A running job stops at its next report
+    manager.cancel(running.id)
+    assert running.cancel_requested
+    wait_for(running)
+    assert running.status == "cancelled" and running.result is None
+    wait_for(manager.submit(lambda job: None))
+    assert queued_calls == []
+    release.set()
+
+
+def test_finished_jobs_are_evicted_oldest_first():
+    manager = JobManager(max_workers=1, max_finished=2)
+    jobs = [wait_for(manager.submit(lambda job, number=number: number, key=number)) for number in range(4)]
+    assert [job.id for job in manager.jobs()] == [job.id for job in jobs[2:]]
+    assert manager.get(jobs[0].id) is None
+    # An evicted key runs again
+    assert manager.submit(lambda job: "new", key=0) is not jobs[0]
+    manager.shutdown()
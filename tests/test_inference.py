@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from did_engine import ClusterStats, bootstrap, permutation_test, synthetic_panel
+from did_engine.inference import _permuted_axis
+
+REPLICATES = 4_000
+
+
+def diff_in_diff(metric, treat, post):
+    """The 2x2 estimate from the cell means."""
+    means = [[metric[(treat == t) & (post == p)].mean() for p in (0, 1)] for t in (0, 1)]
+    return (means[1][1] - means[1][0]) - (means[0][1] - means[0][0])
+
+
+@pytest.fixture
+def panel():
+    dataframe = synthetic_panel(units=40, periods=8, autocorrelation=0.6, seed=14)
+    rows_of_unit = np.arange(len(dataframe)).reshape(40, 8)
+    return dataframe, rows_of_unit
+
+
+def test_bootstrap_std_err_matches_resampling_units(panel):
+    dataframe, rows_of_unit = panel
+    metric, treat, post = (dataframe[name].to_numpy() for name in ("metric", "treat", "post"))
+    rng = np.random.default_rng(15)
+    naive = []
+    for _ in range(REPLICATES):
+        rows = rows_of_unit[rng.integers(0, len(rows_of_unit), len(rows_of_unit))].ravel()
+        naive.append(diff_in_diff(metric[rows], treat[rows], post[rows]))
+
+    clusters = ClusterStats.from_frame(dataframe, "metric", "treat", "post", cluster_name="unit")
+    result = bootstrap(clusters, REPLICATES, seed=16)
+    np.testing.assert_allclose(result.estimate, diff_in_diff(metric, treat, post), rtol=1e-12)
+    np.testing.assert_allclose(result.std_err, np.std(naive, ddof=1), rtol=0.08)
+    assert len(result.replicates) == REPLICATES
+
+
+def test_permutation_spread_matches_shuffling_unit_labels(panel):
+    dataframe, rows_of_unit = panel
+    metric, treat, post = (dataframe[name].to_numpy() for name in ("metric", "treat", "post"))
+    unit_treat = treat[rows_of_unit[:, 0]]
+    rng = np.random.default_rng(17)
+    naive = [diff_in_diff(metric, np.repeat(rng.permutation(unit_treat), 8), post) for _ in range(REPLICATES)]
+
+    clusters = ClusterStats.from_frame(dataframe, "metric", "treat", "post", cluster_name="unit")
+    result = permutation_test(clusters, REPLICATES, seed=18)
+    np.testing.assert_allclose(np.std(result.replicates), np.std(naive), rtol=0.08)
+    expected_p = (1 + np.count_nonzero(np.abs(naive) >= abs(result.estimate))) / (REPLICATES + 1)
+    assert abs(result.p_value - expected_p) < 0.03
+
+
+def test_permutation_needs_clusters_on_one_side_of_a_flag(panel):
+    dataframe, _ = panel
+    # Date blocks hold both groups, and with three dates per block the second one straddles the intervention
+    clusters = ClusterStats.from_frame(dataframe, "metric", "treat", "post", event_date_name="event_date", block_length=3)
+    with pytest.raises(ValueError, match="permutation needs clusters"):
+        _permuted_axis(clusters.matrix)
+    with pytest.raises(ValueError, match="permutation needs clusters"):
+        permutation_test(clusters, 100)
+    # Date blocks that do not straddle it permute the post labels
+    assert _permuted_axis(ClusterStats.from_frame(dataframe, "metric", "treat", "post", event_date_name="event_date", block_length=4).matrix) == 2
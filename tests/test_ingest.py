@@ -0,0 +1,153 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from did_engine import BufferFile, CellStats, file_format, fit_cells, read_columns, read_preview, read_sample, stream_csv, synthetic_panel, write_synthetic_csv
+from did_engine.dates import parse_dates
+from did_engine.ingest import SAMPLE_CACHE_DIR
+
+COLUMNS = ["event_date", "metric", "treat", "post"]
+
+
+def assert_same_cells(streamed, expected):
+    np.testing.assert_array_equal(streamed.count, expected.count)
+    np.testing.assert_allclose(streamed.mean, expected.mean, rtol=1e-12)
+    np.testing.assert_allclose(streamed.sum_sq_dev, expected.sum_sq_dev, rtol=1e-9)
+
+
+def per_date_means(dataframe):
+    means = dataframe.astype({"event_date": str}).groupby(["event_date", "treat"])["metric"].mean().rename("metric").reset_index()
+    return means.assign(event_date=parse_dates(means["event_date"]))
+
+
+def test_stream_csv_matches_in_memory(tmp_path):
+    path = tmp_path / "panel.csv"
+    nrows = write_synthetic_csv(path, units=300, periods=13, chunk_units=70, seed=5)
+    dataframe = pd.read_csv(path)
+    progress = []
+    streamed = stream_csv(str(path), *COLUMNS, chunksize=997, progress=lambda done, total: progress.append((done, total)))
+
+    assert streamed.nrows == nrows == len(dataframe)
+    assert_same_cells(streamed.cells, CellStats.from_frame(dataframe, "metric", "treat", "post"))
+    np.testing.assert_allclose(fit_cells(streamed.cells).params, fit_cells(CellStats.from_frame(dataframe, "metric", "treat", "post")).params)
+    pd.testing.assert_frame_equal(streamed.series.sort_values(["event_date", "treat"], ignore_index=True),
+                                  per_date_means(dataframe), check_dtype=False)
+    assert len(progress) == -(-nrows // 997)
+    assert progress[-1][0] == progress[-1][1] == path.stat().st_size
+
+
+def test_stream_csv_skips_unusable_rows():
+    dataframe = synthetic_panel(units=20, periods=6, seed=6)
+    text = dataframe.to_csv(index=False).splitlines()
+    # A blank flag, a flag outside 0/1 and a non-numeric metric
+    text[3] = ",".join(text[3].split(",")[:4]) + ","
+    text[5] = ",".join(text[5].split(",")[:3]) + ",2," + text[5].split(",")[4]
+    text[8] = ",".join([text[8].split(",")[0], text[8].split(",")[1], "n/a"] + text[8].split(",")[3:])
+    dirty = "\n".join(text) + "\n"
+
+    streamed = stream_csv(io.BytesIO(dirty.encode()), *COLUMNS, chunksize=50)
+    expected = CellStats.from_frame(pd.read_csv(io.StringIO(dirty)), "metric", "treat", "post")
+    assert streamed.nrows == len(dataframe)
+    assert streamed.cells.nobs == len(dataframe) - 3 == expected.nobs
+    assert_same_cells(streamed.cells, expected)
+
+
+@pytest.mark.parametrize("metric_dtype", ["float32", "float64"])
+def test_stream_csv_metric_dtype(tmp_path, metric_dtype):
+    path = tmp_path / "panel.csv"
+    write_synthetic_csv(path, units=50, periods=8, seed=7)
+    streamed = stream_csv(str(path), *COLUMNS, metric_dtype=metric_dtype)
+    expected = CellStats.from_frame(pd.read_csv(path), "metric", "treat", "post")
+    np.testing.assert_allclose(streamed.cells.mean, expected.mean, rtol=1e-6 if metric_dtype == "float32" else 1e-12)
+
+
+def test_stream_csv_numeric_dates_sort_as_numbers():
+    # Periods 1..12 sort as 1, 10, 11, 12, 2, ... when kept as text
+    dataframe = synthetic_panel(units=10, periods=12, seed=12).assign(event_date=lambda frame: pd.factorize(frame["event_date"])[0] + 1)
+    streamed = stream_csv(io.BytesIO(dataframe.to_csv(index=False).encode()), *COLUMNS, chunksize=25)
+    assert pd.api.types.is_integer_dtype(streamed.series["event_date"])
+    expected = dataframe.groupby(["event_date", "treat"])["metric"].mean().rename("metric").reset_index()
+    pd.testing.assert_frame_equal(streamed.series.sort_values(["event_date", "treat"], ignore_index=True), expected, check_dtype=False)
+
+
+def test_buffer_file_reads_without_sharing_the_position(tmp_path):
+    path = tmp_path / "panel.csv"
+    write_synthetic_csv(path, units=40, periods=5, seed=8)
+    upload = io.BytesIO(path.read_bytes())
+    first, second = BufferFile(upload.getbuffer()), BufferFile(upload.getbuffer())
+    assert first.read(10) == upload.getvalue()[:10]
+    assert second.tell() == 0
+    streamed = stream_csv(second, *COLUMNS, chunksize=64)
+    assert streamed.nrows == 200
+    assert first.tell() == 10
+    with pytest.raises(TypeError):
+        first.getbuffer()[0] = 0
+
+
+def write_columnar(path, dataframe, fmt):
+    """Write ``dataframe`` in pieces of 64 rows, so previews cross row groups and record batches."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(dataframe, preserve_index=False)
+    if fmt == "parquet":
+        pq.write_table(table, path, row_group_size=64)
+        return
+    new_writer = pa.ipc.new_file if fmt == "feather" else pa.ipc.new_stream
+    with new_writer(str(path), table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=64):
+            writer.write_batch(batch)
+
+
+@pytest.mark.parametrize("fmt, suffix", [("parquet", ".parquet"), ("feather", ".feather"), ("stream", ".arrow")])
+def test_columnar_reads(tmp_path, fmt, suffix):
+    pytest.importorskip("pyarrow")
+    dataframe = synthetic_panel(units=30, periods=10, seed=21)
+    path = tmp_path / ("panel" + suffix)
+    write_columnar(path, dataframe, fmt)
+    upload = io.BytesIO(path.read_bytes())
+    for source in (str(path), upload, BufferFile(upload.getbuffer())):
+        pd.testing.assert_frame_equal(read_columns(source, ["metric", "unit"], fmt=None if isinstance(source, str) else file_format(path)),
+                                      dataframe[["metric", "unit"]], check_dtype=False)
+        pd.testing.assert_frame_equal(read_preview(source, nrows=150, fmt=file_format(path)), dataframe.iloc[:150], check_dtype=False)
+    pd.testing.assert_frame_equal(read_columns(str(path)), dataframe, check_dtype=False)
+    assert len(read_preview(str(path), nrows=10_000)) == len(dataframe)
+
+
+def test_read_sample_refreshes_its_cache(tmp_path):
+    csv_path = tmp_path / "sample.csv"
+    synthetic_panel(units=5, periods=4, seed=22).to_csv(csv_path, index=False)
+    first = read_sample(str(csv_path))
+    cached = tmp_path / SAMPLE_CACHE_DIR / "sample.feather"
+    assert cached.exists()
+    pd.testing.assert_frame_equal(read_sample(str(csv_path)), first)
+
+    # An edited CSV is newer than its copy, which is then rewritten and used again
+    synthetic_panel(units=6, periods=4, seed=23).to_csv(csv_path, index=False)
+    os.utime(cached, (csv_path.stat().st_mtime - 10, csv_path.stat().st_mtime - 10))
+    pd.testing.assert_frame_equal(read_sample(str(csv_path)), pd.read_csv(csv_path))
+    refreshed = cached.stat().st_mtime
+    assert refreshed >= csv_path.stat().st_mtime
+    pd.testing.assert_frame_equal(read_sample(str(csv_path)), pd.read_csv(csv_path))
+    assert cached.stat().st_mtime == refreshed
+
+
+@pytest.mark.parametrize("blocked", ["read_only", "file_in_the_way"])
+def test_read_sample_without_a_writable_cache(tmp_path, blocked):
+    csv_path = tmp_path / "sample.csv"
+    dataframe = synthetic_panel(units=5, periods=4, seed=24)
+    dataframe.to_csv(csv_path, index=False)
+    if blocked == "read_only":
+        if os.geteuid() == 0:
+            pytest.skip("root can write to read-only directories")
+        tmp_path.chmod(0o555)
+    else:
+        (tmp_path / SAMPLE_CACHE_DIR).write_text("")
+    try:
+        pd.testing.assert_frame_equal(read_sample(str(csv_path)), pd.read_csv(csv_path))
+        assert sorted(entry.name for entry in tmp_path.iterdir()) == sorted(["sample.csv"] + ([SAMPLE_CACHE_DIR] if blocked != "read_only" else []))
+    finally:
+        tmp_path.chmod(0o755)
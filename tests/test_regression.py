@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from did_engine import CellStats, fit_cells, synthetic_panel
+
+smf = pytest.importorskip("statsmodels.formula.api")
+
+
+def assert_matches_statsmodels(dataframe, metric_name, groups_name, intervention_date_name, rtol=1e-7):
+    regression = fit_cells(CellStats.from_frame(dataframe, metric_name, groups_name, intervention_date_name),
+                           groups_name, intervention_date_name)
+    fit = smf.ols(metric_name + " ~ " + groups_name + " * " + intervention_date_name, data=dataframe).fit()
+    assert regression.terms == list(fit.params.index)
+    assert regression.nobs == fit.nobs
+    assert regression.df_resid == fit.df_resid
+    np.testing.assert_allclose(regression.params, fit.params, rtol=rtol, atol=1e-9)
+    if fit.df_resid == 0:
+        # A saturated fit of one row per cell has no residual variance to estimate
+        assert not np.isfinite(regression.bse).any()
+        return
+    conf_int = fit.conf_int()
+    np.testing.assert_allclose(regression.bse, fit.bse, rtol=rtol)
+    np.testing.assert_allclose(regression.pvalues, fit.pvalues, rtol=rtol, atol=1e-12)
+    np.testing.assert_allclose(regression.conf_int_low, conf_int[0], rtol=rtol)
+    np.testing.assert_allclose(regression.conf_int_high, conf_int[1], rtol=rtol)
+
+
+def test_fit_cells_matches_statsmodels_on_samples(sample):
+    dataframe, (_, metric_name, groups_name, intervention_date_name) = sample
+    assert_matches_statsmodels(dataframe, metric_name, groups_name, intervention_date_name)
+
+
+def test_fit_cells_keeps_precision_for_large_levels():
+    # Adding a constant only moves the intercept, so the fit near 0 is the reference
+    dataframe = synthetic_panel(units=400, periods=20, seed=1)
+    reference = fit_cells(CellStats.from_frame(dataframe, "metric", "treat", "post"))
+    dataframe["metric"] += 1e8
+    regression = fit_cells(CellStats.from_frame(dataframe, "metric", "treat", "post"))
+    np.testing.assert_allclose(regression.params[1:], reference.params[1:], rtol=1e-6)
+    np.testing.assert_allclose(regression.bse, reference.bse, rtol=1e-7)
+    np.testing.assert_allclose(regression.pvalues, reference.pvalues, rtol=1e-6, atol=1e-12)
+
+
+def test_cells_merge_like_one_pass():
+    dataframe = synthetic_panel(units=200, periods=10, seed=2)
+    dataframe["metric"] += 1e6
+    whole = CellStats.from_frame(dataframe, "metric", "treat", "post")
+    merged = (CellStats.from_frame(dataframe.iloc[:700], "metric", "treat", "post")
+              + CellStats.from_frame(dataframe.iloc[700:], "metric", "treat", "post"))
+    np.testing.assert_array_equal(merged.count, whole.count)
+    np.testing.assert_allclose(merged.mean, whole.mean, rtol=1e-12)
+    np.testing.assert_allclose(merged.sum_sq_dev, whole.sum_sq_dev, rtol=1e-9)
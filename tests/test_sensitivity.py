@@ -0,0 +1,69 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from did_engine import CellStats, cutover_sweep, first_flagged_date, fit_cells, stream_cutover_sweep, synthetic_panel
+from did_engine.dates import sorted_dates
+
+
+def refit_at(dataframe, event_date_name, metric_name, groups_name, cutover_date):
+    """The regression refit from scratch with ``cutover_date`` as the first date after."""
+    codes, dates = sorted_dates(dataframe[event_date_name])
+    post = (codes >= np.searchsorted(dates, cutover_date)).astype(int)
+    return fit_cells(CellStats.from_frame(dataframe.assign(post=post), metric_name, groups_name, "post"))
+
+
+def assert_sweep_matches_refits(dataframe, event_date_name, metric_name, groups_name, step=1):
+    sweep = cutover_sweep(dataframe, event_date_name, metric_name, groups_name)
+    assert len(sweep) == len(dataframe[event_date_name].dropna().unique()) - 1
+    for row in sweep.iloc[::step].itertuples():
+        regression = refit_at(dataframe, event_date_name, metric_name, groups_name, row.cutover_date)
+        np.testing.assert_allclose(row.diff_in_diff, regression.diff_in_diff, rtol=1e-8, atol=1e-9)
+        np.testing.assert_allclose(row.std_err, regression.bse[3], rtol=1e-8, equal_nan=True)
+        np.testing.assert_allclose([row.ci_low, row.ci_high], [regression.conf_int_low[3], regression.conf_int_high[3]],
+                                   rtol=1e-8, atol=1e-9, equal_nan=True)
+        assert row.nobs_before + row.nobs_after == regression.nobs
+
+
+def test_cutover_sweep_matches_refits_on_samples(sample):
+    dataframe, (event_date_name, metric_name, groups_name, _) = sample
+    assert_sweep_matches_refits(dataframe, event_date_name, metric_name, groups_name, step=7)
+
+
+def test_cutover_sweep_on_large_levels_and_numeric_dates():
+    dataframe = synthetic_panel(units=100, periods=12, seed=3)
+    dataframe["metric"] += 1e7
+    dataframe["period"] = pd.factorize(dataframe["event_date"], sort=True)[0] + 2000
+    sweep = cutover_sweep(dataframe, "period", "metric", "treat")
+    assert sweep["cutover_date"].tolist() == list(range(2001, 2012))
+    assert_sweep_matches_refits(dataframe, "period", "metric", "treat")
+
+
+def test_sweep_at_the_real_cutover_is_the_regression():
+    dataframe = synthetic_panel(units=50, periods=10, seed=4)
+    cutover = first_flagged_date(dataframe, "event_date", "post")
+    assert cutover == pd.Timestamp(dataframe["event_date"].unique()[5])
+    sweep = cutover_sweep(dataframe, "event_date", "metric", "treat").set_index("cutover_date")
+    regression = fit_cells(CellStats.from_frame(dataframe, "metric", "treat", "post"))
+    assert sweep.loc[cutover, "diff_in_diff"] == pytest.approx(regression.diff_in_diff, rel=1e-9)
+    assert sweep.loc[cutover, "std_err"] == pytest.approx(regression.bse[3], rel=1e-9)
+
+
+def test_stream_cutover_sweep_matches_in_memory(sample):
+    dataframe, columns = sample
+    csv = io.BytesIO(dataframe.to_csv(index=False).encode())
+    sweep, first_date = stream_cutover_sweep(csv, *columns, chunksize=37)
+    pd.testing.assert_frame_equal(sweep, cutover_sweep(dataframe, *columns[:3]), rtol=1e-9, check_dtype=False)
+    assert first_date == first_flagged_date(dataframe, columns[0], columns[3])
+
+
+def test_stream_cutover_sweep_sorts_numeric_dates_as_numbers():
+    dataframe = synthetic_panel(units=60, periods=12, seed=5)
+    dataframe["period"] = pd.factorize(dataframe["event_date"], sort=True)[0] + 1
+    csv = io.BytesIO(dataframe.to_csv(index=False).encode())
+    sweep, first_date = stream_cutover_sweep(csv, "period", "metric", "treat", "post", chunksize=50)
+    assert sweep["cutover_date"].tolist() == list(range(2, 13))
+    assert first_date == 7
+    pd.testing.assert_frame_equal(sweep, cutover_sweep(dataframe, "period", "metric", "treat"), rtol=1e-9, check_dtype=False)
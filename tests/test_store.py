@@ -0,0 +1,58 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from did_engine import CellStats, IncrementalAnalysis, synthetic_panel
+
+
+def test_appends_match_one_pass_and_skip_duplicates(tmp_path):
+    dataframe = synthetic_panel(units=100, periods=12, seed=9)
+    analysis = IncrementalAnalysis.create(str(tmp_path), "panel", "event_date", "metric", "treat", "post")
+    assert analysis.append(dataframe.iloc[:500]).new_rows == 500
+    report = analysis.append(dataframe.iloc[300:])
+    assert (report.new_rows, report.duplicate_rows) == (700, 200)
+
+    expected = CellStats.from_frame(dataframe, "metric", "treat", "post")
+    np.testing.assert_array_equal(analysis.cells().count, expected.count)
+    np.testing.assert_allclose(analysis.cells().mean, expected.mean, rtol=1e-12)
+    np.testing.assert_allclose(analysis.cells().sum_sq_dev, expected.sum_sq_dev, rtol=1e-9)
+
+
+def test_same_rows_in_other_dtypes_are_duplicates(tmp_path):
+    dataframe = synthetic_panel(units=30, periods=6, seed=10)
+    analysis = IncrementalAnalysis.create(str(tmp_path), "panel", "event_date", "metric", "treat", "post")
+    analysis.append(dataframe)
+    columnar = dataframe.assign(event_date=pd.to_datetime(dataframe["event_date"]), treat=dataframe["treat"].astype(float))
+    assert analysis.append(columnar).duplicate_rows == len(dataframe)
+    assert analysis.append(dataframe.assign(metric=dataframe["metric"].astype(object))).new_rows == 0
+
+
+def test_concurrent_appends_keep_every_row(tmp_path):
+    dataframe = synthetic_panel(units=80, periods=10, seed=11)
+    IncrementalAnalysis.create(str(tmp_path), "panel", "event_date", "metric", "treat", "post")
+    threads = [threading.Thread(target=lambda part: IncrementalAnalysis.open(str(tmp_path), "panel").append(part), args=(dataframe.iloc[start::6],))
+               for start in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    analysis = IncrementalAnalysis.open(str(tmp_path), "panel")
+    assert analysis.meta["nrows"] == len(dataframe)
+    assert analysis.cells().nobs == len(dataframe)
+
+
+def test_row_key_keeps_new_rows_with_repeated_values(tmp_path):
+    rows = pd.DataFrame({"event_id": [1, 2, 3], "event_date": "2024-01-01", "metric": 1.0, "treat": 1, "post": 0})
+    later = rows.assign(event_id=[4, 5, 3])
+    keyed = IncrementalAnalysis.create(str(tmp_path), "keyed", "event_date", "metric", "treat", "post", row_key="event_id")
+    keyed.append(rows)
+    report = keyed.append(later)
+    assert (report.new_rows, report.duplicate_rows) == (2, 1)
+    assert keyed.cells().nobs == 5
+
+    # Without a row key every column of the upload is fingerprinted, the event id included
+    unkeyed = IncrementalAnalysis.create(str(tmp_path), "unkeyed", "event_date", "metric", "treat", "post")
+    unkeyed.append(rows)
+    assert unkeyed.row_columns == list(rows.columns)
+    assert unkeyed.append(later.assign(event_id=later["event_id"].astype(str))).new_rows == 2